@@ -0,0 +1,163 @@
+"""
+Lip-reading pieces shared by the live worker (predict_live.py) and the
+offline batch processor (backend/batch.py): the lip crop and preprocessing,
+the talking / not-talking word segmentation and the word classifier.
+
+TensorFlow is only imported by build_model(), so processes that just crop
+lips (the batch processor's pool workers) never pay for it.
+"""
+import math
+import os
+import sys
+from collections import deque
+
+import cv2
+import numpy as np
+
+DEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(DEMO_DIR, "..", "data_collection"))
+from constants import TOTAL_FRAMES, VALID_WORD_THRESHOLD, NOT_TALKING_THRESHOLD, PAST_BUFFER_SIZE, LIP_WIDTH, LIP_HEIGHT
+
+MODEL_DIR = os.path.join(DEMO_DIR, "..", "model")
+
+label_dict = {6: 'hello', 5: 'dog', 10: 'my', 12: 'you', 9: 'lips', 3: 'cat', 11: 'read', 0: 'a', 4: 'demo', 7: 'here', 8: 'is', 1: 'bye', 2: 'can'}
+#label_dict = {2: 'my', 1: 'lips', 3: 'read', 0: 'demo'}
+
+# Define the input shape
+input_shape = (TOTAL_FRAMES, 80, 112, 3)
+
+TALKING_DISTANCE = 45  # upper/lower lip distance (px) above which the person is talking
+
+_SHARPEN = np.array([[-1, -1, -1],
+                     [-1, 9, -1],
+                     [-1, -1, -1]])
+
+
+def build_model(weights=os.path.join(MODEL_DIR, "model_weights.h5")):
+    import tensorflow as tf
+
+    # Define the model architecture
+    model = tf.keras.Sequential([
+        tf.keras.layers.Conv3D(16, (3, 3, 3), activation='relu', input_shape=input_shape),
+        tf.keras.layers.MaxPooling3D((2, 2, 2)),
+        tf.keras.layers.Conv3D(64, (3, 3, 3), activation='relu'),
+        tf.keras.layers.MaxPooling3D((2, 2, 2)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(128, activation='relu'),
+        tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense(64, activation='relu'),
+        tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense(len(label_dict), activation='softmax')
+    ])
+    model.load_weights(weights, by_name=True)
+    return model
+
+
+def load_face_models(weights=os.path.join(MODEL_DIR, "face_weights.dat")):
+    """(face detector, 68-point landmark predictor)"""
+    import dlib
+
+    return dlib.get_frontal_face_detector(), dlib.shape_predictor(weights)
+
+
+def crop_lips(frame, landmarks):
+    """Return (preprocessed LIP_HEIGHT x LIP_WIDTH lip crop, lip opening in px) for one face."""
+    # Calculate the distance between the upper and lower lip landmarks
+    mouth_top = (landmarks.part(51).x, landmarks.part(51).y)
+    mouth_bottom = (landmarks.part(57).x, landmarks.part(57).y)
+    lip_distance = math.hypot(mouth_bottom[0] - mouth_top[0], mouth_bottom[1] - mouth_top[1])
+
+    lip_left = landmarks.part(48).x
+    lip_right = landmarks.part(54).x
+    lip_top = landmarks.part(50).y
+    lip_bottom = landmarks.part(58).y
+
+    # Add padding if necessary to get a 76x110 frame
+    width_diff = LIP_WIDTH - (lip_right - lip_left)
+    height_diff = LIP_HEIGHT - (lip_bottom - lip_top)
+    pad_left = width_diff // 2
+    pad_right = width_diff - pad_left
+    pad_top = height_diff // 2
+    pad_bottom = height_diff - pad_top
+
+    # Ensure that the padding doesn't extend beyond the original frame
+    pad_left = min(pad_left, lip_left)
+    pad_right = min(pad_right, frame.shape[1] - lip_right)
+    pad_top = min(pad_top, lip_top)
+    pad_bottom = min(pad_bottom, frame.shape[0] - lip_bottom)
+
+    # Create padded lip region
+    lip_frame = frame[lip_top - pad_top:lip_bottom + pad_bottom, lip_left - pad_left:lip_right + pad_right]
+    lip_frame = cv2.resize(lip_frame, (LIP_WIDTH, LIP_HEIGHT))
+
+    lip_frame_lab = cv2.cvtColor(lip_frame, cv2.COLOR_BGR2LAB)
+    # Apply contrast stretching to the L channel of the LAB image
+    l_channel, a_channel, b_channel = cv2.split(lip_frame_lab)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(3, 3))
+    l_channel_eq = clahe.apply(l_channel)
+
+    # Merge the equalized L channel with the original A and B channels
+    lip_frame_eq = cv2.merge((l_channel_eq, a_channel, b_channel))
+    lip_frame_eq = cv2.cvtColor(lip_frame_eq, cv2.COLOR_LAB2BGR)
+    lip_frame_eq = cv2.GaussianBlur(lip_frame_eq, (7, 7), 0)
+    lip_frame_eq = cv2.bilateralFilter(lip_frame_eq, 5, 75, 75)
+
+    # Apply the kernel to the input image
+    lip_frame_eq = cv2.filter2D(lip_frame_eq, -1, _SHARPEN)
+    lip_frame_eq = cv2.GaussianBlur(lip_frame_eq, (5, 5), 0)
+    return lip_frame_eq, lip_distance
+
+
+class WordSegmenter:
+    """Collects lip crops while the person talks and cuts them into word clips.
+
+    feed() returns a (1, TOTAL_FRAMES, 80, 112, 3) clip once a word has ended,
+    otherwise None.
+    """
+
+    def __init__(self):
+        self.curr_word_frames = []
+        self.not_talking_counter = 0
+        self.past_word_frames = deque(maxlen=PAST_BUFFER_SIZE)
+        self.talking = False
+
+    def feed(self, lip_frame, lip_distance):
+        clip = None
+        self.talking = lip_distance > TALKING_DISTANCE
+        if self.talking:
+            self.curr_word_frames.append(lip_frame)
+            self.not_talking_counter = 0
+            return None
+
+        self.not_talking_counter += 1
+        n = len(self.curr_word_frames)
+        if self.not_talking_counter >= NOT_TALKING_THRESHOLD and n + PAST_BUFFER_SIZE == TOTAL_FRAMES:
+            frames = list(self.past_word_frames) + self.curr_word_frames
+            clip = np.array([frames[:input_shape[0]]])
+            self.curr_word_frames = []
+            self.not_talking_counter = 0
+        elif self.not_talking_counter < NOT_TALKING_THRESHOLD and n + PAST_BUFFER_SIZE < TOTAL_FRAMES and n > VALID_WORD_THRESHOLD:
+            self.curr_word_frames.append(lip_frame)
+            self.not_talking_counter = 0
+        elif n < VALID_WORD_THRESHOLD or (self.not_talking_counter >= NOT_TALKING_THRESHOLD and n + PAST_BUFFER_SIZE > TOTAL_FRAMES):
+            self.curr_word_frames = []
+
+        self.past_word_frames.append(lip_frame)
+        return clip
+
+
+def predict_word(model, clip, spoken_already):
+    """Return (label, confidence, [(prob, label), ...] best first) for one word clip.
+
+    Words in ``spoken_already`` are skipped in favour of the next most likely one.
+    """
+    prediction = model.predict(clip)
+    sorted_probs = sorted(((prediction[0][i], label_dict[i]) for i in range(len(prediction[0]))),
+                          key=lambda x: x[0], reverse=True)
+    predicted_class_index = np.argmax(prediction)
+    while label_dict[predicted_class_index] in spoken_already:
+        # If the predicted label has already been spoken,
+        # set its probability to zero and choose the next highest probability
+        prediction[0][predicted_class_index] = 0
+        predicted_class_index = np.argmax(prediction)
+    return label_dict[predicted_class_index], float(prediction[0][predicted_class_index]), sorted_probs
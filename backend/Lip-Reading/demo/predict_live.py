@@ -1,279 +1,174 @@
 import os
+import time
 import cv2
-import dlib
-import math
-import json
-import statistics
-from PIL import Image
-import imageio.v2 as imageio
-import numpy as np
-import csv
-from collections import deque
-import tensorflow as tf
 import sys
-sys.path.append('../data_collection')
-from constants import *
-from constants import TOTAL_FRAMES, VALID_WORD_THRESHOLD, NOT_TALKING_THRESHOLD, PAST_BUFFER_SIZE, LIP_WIDTH, LIP_HEIGHT
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from frame_ring import CAMERA_RING, LIP_READING_RING, attach_or_none
+from capture import CameraReader, LatestFrameCapture
+from camera_discovery import open_camera
+from worker_ipc import WorkerLink
+from metrics import StageMetrics
+from lip_pipeline import WordSegmenter, build_model, crop_lips, load_face_models, predict_word
+
+model = build_model()
+
+# Load the detector and the predictor
+detector, predictor = load_face_models()
+
+# ring names are per camera session; the server passes them in the environment
+frame_ring = attach_or_none(os.environ.get("BOLT_PREVIEW_RING", LIP_READING_RING))
+link = WorkerLink.from_env("lip_reading")
+# stage timings ride along with the link's heartbeats
+metrics = link.metrics if link is not None else StageMetrics()
+tracer = link.tracer if link is not None else None
+
+
+def open_video():
+    """Frames from the server's capture service, or the camera itself when standalone."""
+    if link is not None:
+        reader = CameraReader.attach_or_none(os.environ.get("BOLT_CAMERA_RING", CAMERA_RING), metrics=metrics)
+        if reader is not None:
+            return reader
+    cap = open_camera(0)
+    return LatestFrameCapture(cap, metrics=metrics) if cap is not None else None
+
+
+def run_session():
+    """Read lips until the server deactivates us (or Esc is pressed).
+
+    Returns True if the worker should exit afterwards.
+    """
+    cap = open_video()
+    if cap is None:
+        print("CRITICAL: Failed to open camera in predict_live.py")
+        if link is not None:
+            link.state("error", "camera unavailable")
+        return link is None
+    if link is not None:
+        link.state("active")
+    frame_id = 0
+    count = 0
+    #cap.set(cv2.CAP_PROP_FPS, 60)
+    segmenter = WordSegmenter()
+
+    predicted_word_label = None
+    draw_prediction = False
+
+    spoken_already = []
 
-# Backend Integration Paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-OUTPUT_FILE = os.path.join(BASE_DIR, "..", "output.txt")
-STOP_FILE = os.path.join(BASE_DIR, "..", "stop.txt")
-FRAME_FILE = os.path.join(BASE_DIR, "..", "frame.jpg")
-
-
-
-label_dict = {6: 'hello', 5: 'dog', 10: 'my', 12: 'you', 9: 'lips', 3: 'cat', 11: 'read', 0: 'a', 4: 'demo', 7: 'here', 8: 'is', 1: 'bye', 2: 'can'}
-count = 0
-#label_dict = {2: 'my', 1: 'lips', 3: 'read', 0: 'demo'}
-
-# Define the input shape
-input_shape = (TOTAL_FRAMES, 80, 112, 3)
-
-'''
-model = tf.keras.Sequential([
-    tf.keras.layers.Conv3D(16, (3, 3, 3), activation='relu', input_shape=input_shape),
-    tf.keras.layers.MaxPooling3D((2, 2, 2)),
-    tf.keras.layers.Conv3D(64, (3, 3, 3), activation='relu'),
-    tf.keras.layers.MaxPooling3D((2, 2, 2)),
-    tf.keras.layers.Conv3D(128, (3, 3, 3), activation='relu'),
-    tf.keras.layers.MaxPooling3D((2, 2, 2)),
-    tf.keras.layers.Flatten(),
-    tf.keras.layers.Dense(128, activation='relu'),
-    tf.keras.layers.Dropout(0.3),
-    tf.keras.layers.Dense(64, activation='relu'),
-    tf.keras.layers.Dropout(0.3),
-    tf.keras.layers.Dense(len(label_dict), activation='softmax')
-])
-'''
-
-# Define the model architecture
-model = tf.keras.Sequential([
-    tf.keras.layers.Conv3D(16, (3, 3, 3), activation='relu', input_shape=input_shape),
-    tf.keras.layers.MaxPooling3D((2, 2, 2)),
-    tf.keras.layers.Conv3D(64, (3, 3, 3), activation='relu'),
-    tf.keras.layers.MaxPooling3D((2, 2, 2)),
-    tf.keras.layers.Flatten(),
-    tf.keras.layers.Dense(128, activation='relu'),
-    tf.keras.layers.Dropout(0.5),
-    tf.keras.layers.Dense(64, activation='relu'),
-    tf.keras.layers.Dropout(0.5),
-    tf.keras.layers.Dense(len(label_dict), activation='softmax')
-])
-
-
-model.load_weights('../model/model_weights.h5', by_name=True)
-
-# Load the detector
-detector = dlib.get_frontal_face_detector()
-
-# Load the predictor
-predictor = dlib.shape_predictor("../model/face_weights.dat")
-
-# read the image
-# Robust camera opener function
-def open_camera_robust(device=0):
-    target_indices = [0, 1, 2]
-    backends = [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
-    
-    for index in target_indices:
-        for backend in backends:
-            try:
-                cap = cv2.VideoCapture(index, backend)
-                if cap.isOpened():
-                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                    
-                    ret, frame = cap.read()
-                    if ret and frame is not None:
-                        print(f"Camera opened on index {index} with backend: {backend}")
-                        return cap
-                    cap.release()
-            except: pass
-    return None
-
-cap = open_camera_robust(0)
-if cap is None:
-    print("CRITICAL: Failed to open camera in predict_live.py")
-    exit(1)
-#cap.set(cv2.CAP_PROP_FPS, 60)
-curr_word_frames = []
-not_talking_counter = 0
-
-
-
-first_word = True
-labels = []
-
-past_word_frames = deque(maxlen=PAST_BUFFER_SIZE)
-
-ending_buffer_size = 5
-
-predicted_word_label = None
-draw_prediction = False
-
-spoken_already = []
-
-while True:
-    if os.path.exists(STOP_FILE):
-        print("Stop file found, exiting...")
-        break
-    _, frame = cap.read()
-    # Convert image into grayscale
-    gray = cv2.cvtColor(src=frame, code=cv2.COLOR_BGR2GRAY)
-
-    # Use detector to find landmarks
-    faces = detector(gray)
-    
-    for face in faces:
-        x1 = face.left()  # left point
-        y1 = face.top()  # top point
-        x2 = face.right()  # right point
-        y2 = face.bottom()  # bottom point
-
-        # Create landmark object
-        landmarks = predictor(image=gray, box=face)
-
-        # Calculate the distance between the upper and lower lip landmarks
-        mouth_top = (landmarks.part(51).x, landmarks.part(51).y)
-        mouth_bottom = (landmarks.part(57).x, landmarks.part(57).y)
-        lip_distance = math.hypot(mouth_bottom[0] - mouth_top[0], mouth_bottom[1] - mouth_top[1])
-
-
-
-        lip_left = landmarks.part(48).x
-        lip_right = landmarks.part(54).x
-        lip_top = landmarks.part(50).y
-        lip_bottom = landmarks.part(58).y
-
-        # Add padding if necessary to get a 76x110 frame
-        width_diff = LIP_WIDTH - (lip_right - lip_left)
-        height_diff = LIP_HEIGHT - (lip_bottom - lip_top)
-        pad_left = width_diff // 2
-        pad_right = width_diff - pad_left
-        pad_top = height_diff // 2
-        pad_bottom = height_diff - pad_top
-
-        # Ensure that the padding doesn't extend beyond the original frame
-        pad_left = min(pad_left, lip_left)
-        pad_right = min(pad_right, frame.shape[1] - lip_right)
-        pad_top = min(pad_top, lip_top)
-        pad_bottom = min(pad_bottom, frame.shape[0] - lip_bottom)
-
-        # Create padded lip region
-        lip_frame = frame[lip_top - pad_top:lip_bottom + pad_bottom, lip_left - pad_left:lip_right + pad_right]
-        lip_frame = cv2.resize(lip_frame, (LIP_WIDTH, LIP_HEIGHT))
-
-        
-        lip_frame_lab = cv2.cvtColor(lip_frame, cv2.COLOR_BGR2LAB)
-        # Apply contrast stretching to the L channel of the LAB image
-        l_channel, a_channel, b_channel = cv2.split(lip_frame_lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(3,3))
-        l_channel_eq = clahe.apply(l_channel)
-
-        # Merge the equalized L channel with the original A and B channels
-        lip_frame_eq = cv2.merge((l_channel_eq, a_channel, b_channel))
-        lip_frame_eq = cv2.cvtColor(lip_frame_eq, cv2.COLOR_LAB2BGR)
-        lip_frame_eq= cv2.GaussianBlur(lip_frame_eq, (7, 7), 0)
-        lip_frame_eq = cv2.bilateralFilter(lip_frame_eq, 5, 75, 75)
-        kernel = np.array([[-1,-1,-1],
-                   [-1, 9,-1],
-                   [-1,-1,-1]])
-
-        # Apply the kernel to the input image
-        lip_frame_eq = cv2.filter2D(lip_frame_eq, -1, kernel)
-        lip_frame_eq= cv2.GaussianBlur(lip_frame_eq, (5, 5), 0)
-        lip_frame = lip_frame_eq
-        
-        
-        # Draw a circle around the mouth
-        for n in range(48, 61):
-            x = landmarks.part(n).x
-            y = landmarks.part(n).y
-            cv2.circle(img=frame, center=(x, y), radius=3, color=(0, 255, 0), thickness=-1)
-
-        if lip_distance > 45: # person is talking
-            cv2.putText(frame, "Talking", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            curr_word_frames += [lip_frame.tolist()]
-        
-            not_talking_counter = 0
-            draw_prediction = False
-        else:
-            cv2.putText(frame, "Not talking", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            not_talking_counter += 1
-            if not_talking_counter >= NOT_TALKING_THRESHOLD and len(curr_word_frames) + PAST_BUFFER_SIZE == TOTAL_FRAMES: 
-
-                curr_word_frames = list(past_word_frames) + curr_word_frames
-
-                curr_data = np.array([curr_word_frames[:input_shape[0]]])
-
-                print("*********", curr_data.shape)
-                print(spoken_already)
-                prediction = model.predict(curr_data)
-
-                prob_per_class = []
-                for i in range(len(prediction[0])):
-                    prob_per_class.append((prediction[0][i], label_dict[i]))
-                sorted_probs = sorted(prob_per_class, key=lambda x: x[0], reverse=True)
-                for prob, label in sorted_probs:
-                    print(f"{label}: {prob:.3f}")
-
-                predicted_class_index = np.argmax(prediction)
-                while label_dict[predicted_class_index] in spoken_already:
-                    # If the predicted label has already been spoken,
-                    # set its probability to zero and choose the next highest probability
-                    prediction[0][predicted_class_index] = 0
-                    predicted_class_index = np.argmax(prediction)
-                predicted_word_label = label_dict[predicted_class_index]
-                spoken_already.append(predicted_word_label)
-
-                print("FINISHED!", predicted_word_label)
-                # Write result to output file for backend
+    try:
+        while True:
+            # graceful stop when the server asks for it
+            if link is not None:
+                cmd = link.command()
+                if cmd in ("deactivate", "shutdown"):
+                    print(f"Received {cmd}, ending lip reading session...")
+                    return cmd == "shutdown"
+            _, frame = cap.read()
+            if frame is None:
+                time.sleep(0.05)
+                continue
+            captured_at = cap.last_timestamp
+            frame_start = time.perf_counter()
+            if link is not None:
+                link.tick()
+            frame_id += 1
+            # Convert image into grayscale
+            gray = cv2.cvtColor(src=frame, code=cv2.COLOR_BGR2GRAY)
+
+            # Use detector to find landmarks
+            with metrics.time("face_detector"):
+                faces = detector(gray)
+
+            for face in faces:
+                # Create landmark object
+                with metrics.time("landmark_predictor"):
+                    landmarks = predictor(image=gray, box=face)
+                with metrics.time("lip_preprocess"):
+                    lip_frame, lip_distance = crop_lips(frame, landmarks)
+
+                # Draw a circle around the mouth
+                for n in range(48, 61):
+                    x = landmarks.part(n).x
+                    y = landmarks.part(n).y
+                    cv2.circle(img=frame, center=(x, y), radius=3, color=(0, 255, 0), thickness=-1)
+
+                curr_data = segmenter.feed(lip_frame, lip_distance)
+                if segmenter.talking: # person is talking
+                    cv2.putText(frame, "Talking", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                    draw_prediction = False
+                else:
+                    cv2.putText(frame, "Not talking", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+                if curr_data is not None:
+                    print("*********", curr_data.shape)
+                    print(spoken_already)
+                    with metrics.time("model_predict"):
+                        predicted_word_label, confidence, sorted_probs = predict_word(model, curr_data, spoken_already)
+                    for prob, label in sorted_probs:
+                        print(f"{label}: {prob:.3f}")
+                    spoken_already.append(predicted_word_label)
+
+                    print("FINISHED!", predicted_word_label)
+                    # Send result event to the backend
+                    if link is not None:
+                        link.result("lip-reading", predicted_word_label, confidence,
+                                    timestamp=captured_at, frame_id=frame_id)
+
+                    draw_prediction = True
+                    count = 0
+
+            if(draw_prediction and count < 20):
+                count += 1
+                cv2.putText(frame, predicted_word_label, (50 ,100), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 0, 0), 2)
+
+            cv2.imshow(winname="Mouth", mat=frame)
+
+            # Publish frame to the shared-memory ring for backend streaming
+            if frame_ring is not None:
                 try:
-                    with open(OUTPUT_FILE, "w") as f:
-                        f.write(predicted_word_label)
+                    with metrics.time("jpeg_encode"):
+                        ok, buf = cv2.imencode('.jpg', frame)
+                    if ok:
+                        frame_ring.write(buf)
                 except Exception as e:
-                    print(f"Error writing output: {e}")
-
-                draw_prediction = True
-                count = 0
-
-                curr_word_frames = []
-                not_talking_counter = 0
-            elif not_talking_counter < NOT_TALKING_THRESHOLD and len(curr_word_frames) + PAST_BUFFER_SIZE < TOTAL_FRAMES and len(curr_word_frames) > VALID_WORD_THRESHOLD:
-                curr_word_frames += [lip_frame.tolist()]
-                not_talking_counter = 0
-            elif len(curr_word_frames) < VALID_WORD_THRESHOLD or (not_talking_counter >= NOT_TALKING_THRESHOLD and len(curr_word_frames) + PAST_BUFFER_SIZE > TOTAL_FRAMES):
-                curr_word_frames = []
-
-            past_word_frames+= [lip_frame.tolist()]
-            if len(past_word_frames) > PAST_BUFFER_SIZE:
-                past_word_frames.pop(0)
-
-    if(draw_prediction and count < 20):
-        count += 1
-        cv2.putText(frame, predicted_word_label, (50 ,100), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 0, 0), 2)
-
-    cv2.imshow(winname="Mouth", mat=frame)
-    
-    # Write frame to file for backend streaming
-    try:
-        cv2.imwrite(FRAME_FILE, frame)
-    except Exception as e:
-        pass
-
-
-    key = cv2.waitKey(1)
-    if key == ord('q'):
-        spoken_already = []
-
-    # Exit when escape is pressed
-    if key == 27:
-        break
-
-
-cap.release()
-
-# Close all windows
-cv2.destroyAllWindows()
\ No newline at end of file
+                    print("[WARN] Failed to publish frame:", e)
+
+            if tracer is not None:
+                tracer.complete("frame", frame_start, time.perf_counter(), cat="frame", frame_id=frame_id)
+
+            key = cv2.waitKey(1)
+            if key == ord('q'):
+                spoken_already = []
+
+            # Exit when escape is pressed
+            if key == 27:
+                return link is None
+
+    finally:
+        cap.release()
+        # Close all windows
+        cv2.destroyAllWindows()
+        if link is not None:
+            link.state("idle")
+
+
+try:
+    if link is None:
+        # standalone: just run one session
+        run_session()
+    else:
+        # ready handshake: model weights and dlib predictor are loaded
+        link.state("idle")
+        print("Lip reading worker warm, waiting for activation...")
+        while True:
+            cmd = link.command(None)
+            if cmd == "shutdown":
+                break
+            if cmd == "activate" and run_session():
+                break
+finally:
+    if frame_ring is not None:
+        frame_ring.close()
+    if link is not None:
+        link.close()
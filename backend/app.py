@@ -1,57 +1,62 @@
 
-from flask import Flask, jsonify, Response
+from flask import Flask, jsonify, Response, request
 import subprocess
-import threading
 from flask_cors import CORS
 import os
-import cv2
 import time
 import sys
+import atexit
+import json
+import tempfile
+from streaming import etag_matches, mjpeg_part, parse_snapshot_wait, parse_stream_args, snapshot_etag
+from results import SSE_KEEPALIVE, sse_message
+from metrics import MetricsRegistry
+from tracing import Tracer
+from sessions import COMBINED, DEFAULT_SESSION, MODES, CameraSession, SessionRegistry
+from log_ring import LEVELS, LogRing
+from history import HistoryStore
 
 app = Flask(__name__)
 CORS(app)
 
-# To store last recognized output
-latest_result = {"type": None, "text": ""}
-_threads = {}
+# Every line the server and its workers print lands here; /debug_logs serves it
+log_ring = LogRing(log_dir=os.path.join(os.path.dirname(__file__), "logs"))
+log_ring.capture_std_streams("server")
 
-# --------------------- #
-# Helper Functions
-# --------------------- #
-def read_output_file(file_path):
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except Exception as e:
-            print("Error reading output file:", e)
-    return ""
+# Every recognition result of every camera session is kept: recent ones in
+# memory, all of them in SQLite
+history = HistoryStore(os.environ.get("BOLT_HISTORY_DB", os.path.join(os.path.dirname(__file__), "history.db")))
+atexit.register(history.flush)
 
-def ensure_removed(path):
-    try:
-        if os.path.exists(path):
-            os.remove(path)
-    except Exception:
-        pass
+# Counters and per-stage latency histograms served by /metrics; while
+# tracing is switched on every stage is also recorded as a trace span
+tracer = Tracer("server")
+metrics = MetricsRegistry(tracer=tracer)
+
+def log_component(worker, env):
+    """Log component of a worker: its name, plus the camera session it serves."""
+    return f"{worker}@{env['BOLT_SESSION']}" if env.get("BOLT_SESSION") else worker
+
+
+def worker_python():
+    """The interpreter recognition jobs run under: the first venv found, else this one."""
+    base_dir = os.path.dirname(__file__)
+    for venv in ("venv", "LH", "LH2"):
+        candidate = os.path.join(base_dir, venv, "Scripts", "python.exe")
+        if os.path.exists(candidate):
+            return candidate
+    print("⚠️  venv python not found, falling back to", sys.executable, flush=True)
+    return sys.executable
 
 
 # --------------------- #
 # LIP READING
 # --------------------- #
-def run_lip_reading():
-    debug_path = os.path.join(os.path.dirname(__file__), "debug_trace.txt")
-    with open(debug_path, "a") as f:
-        f.write("Entered run_lip_reading\n")
-    print(f"Written debug trace to {debug_path}", file=sys.stderr)
-    global latest_result
-    print("Entered run_lip_reading", file=sys.stderr)
+def run_lip_reading(env):
+    """Spawn the long-lived lip-reading worker. It idles until activated over IPC."""
+    print("[DEBUG] Entered run_lip_reading")
     try:
         base_dir = os.path.dirname(__file__)
-        venv_python = os.path.join(base_dir, "venv", "Scripts", "python.exe")
-        if not os.path.exists(venv_python):
-             venv_python = os.path.join(base_dir, "LH", "Scripts", "python.exe")
-        if not os.path.exists(venv_python):
-             venv_python = os.path.join(base_dir, "LH2", "Scripts", "python.exe")
         # robust path resolution for predict_script
         candidate1 = os.path.join(base_dir, "Lip-Reading", "demo", "predict_live.py")
         candidate2 = "/mnt/data/predict.py"  # uploaded/test file location
@@ -63,135 +68,77 @@ def run_lip_reading():
             # keep candidate1 as default so existing behavior & error handling remain
             predict_script = candidate1
         print(f"[DEBUG] Using predict_script path: {predict_script}", flush=True)
-        output_file = os.path.join(base_dir, "Lip-Reading", "output.txt")
-        stop_file = os.path.join(base_dir, "Lip-Reading", "stop.txt")
-
-        print(f"Removing stop file: {stop_file}", flush=True)
-        ensure_removed(output_file)
-        ensure_removed(stop_file)
-        if os.path.exists(stop_file):
-            print("Failed to remove stop file!", flush=True)
-        else:
-            print("Stop file removed successfully.", flush=True)
-
-        if not os.path.exists(venv_python):
-            print("⚠️  venv python not found, will fallback to system python if available:", venv_python, flush=True)
-
-        logs_dir = os.path.join(base_dir, "logs")
-        os.makedirs(logs_dir, exist_ok=True)
-        log_path = os.path.join(logs_dir, "lip_reading.log")
-        try:
-            print("▶️ Starting Lip Reading subprocess (Popen)...", flush=True)
-            with open(log_path, "a", encoding="utf-8") as lf:
-                # choose the python executable: prefer venv, else use the running interpreter
-                python_exec = venv_python if os.path.exists(venv_python) else sys.executable
-                print(f"[DEBUG] lip_reading will use python_exec={python_exec}", flush=True)
-                # write debug info to the lip_reading log to help diagnose startup failures
-                try:
-                    lf.write(f"[DEBUG] lip_reading will use python_exec={python_exec}\n")
-                    lf.write(f"[DEBUG] predict_script={predict_script}\n")
-                    lf.write(f"[DEBUG] predict_script exists={os.path.exists(predict_script)}\n")
-                    lf.write(f"[DEBUG] predict_script dirname exists={os.path.isdir(os.path.dirname(predict_script))}\n")
-                    lf.flush()
-                except Exception:
-                    pass
-                cmd = [python_exec, "-u", predict_script]
-                print(f"Running command: {cmd}", flush=True)
-                # Set UTF-8 encoding to prevent UnicodeEncodeError from emoji/UTF-8 output
-                env = os.environ.copy()
-                env['PYTHONIOENCODING'] = 'utf-8'
-                env.setdefault('LANG', 'en_US.UTF-8')
-                proc = subprocess.Popen(cmd, stdout=lf, stderr=subprocess.STDOUT, cwd=os.path.dirname(predict_script) if os.path.isdir(os.path.dirname(predict_script)) else None, env=env)
-                # store process so it can be inspected by other endpoints if needed
-                _threads['lip_reading_proc'] = proc
-                print(f"LipReading Popen started pid={proc.pid}", flush=True)
-        except Exception as e:
-            print("❌ Lip Reading error:", e, flush=True)
-            # Remove the STARTING sentinel if we failed to start
-            if _threads.get('lip_reading_proc') == "STARTING":
-                _threads.pop('lip_reading_proc', None)
 
+        print("▶️ Starting Lip Reading worker (Popen)...", flush=True)
+        # choose the python executable: prefer venv, else use the running interpreter
+        python_exec = worker_python()
+        print(f"[DEBUG] lip_reading will use python_exec={python_exec}", flush=True)
+        # record startup details under the worker's component to help diagnose startup failures
+        component = log_component("lip_reading", env)
+        log_ring.log("DEBUG", component, f"python_exec={python_exec}")
+        log_ring.log("DEBUG", component, f"predict_script={predict_script} exists={os.path.exists(predict_script)}")
+        cmd = [python_exec, "-u", predict_script]
+        print(f"Running command: {cmd}", flush=True)
+        # Set UTF-8 encoding to prevent UnicodeEncodeError from emoji/UTF-8 output
+        env['PYTHONIOENCODING'] = 'utf-8'
+        env.setdefault('LANG', 'en_US.UTF-8')
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace",
+                                cwd=os.path.dirname(predict_script) if os.path.isdir(os.path.dirname(predict_script)) else None, env=env)
+        log_ring.follow(proc.stdout, component)
+        print(f"LipReading Popen started pid={proc.pid}", flush=True)
+        return proc
     except Exception as e:
         print(f"CRITICAL ERROR in run_lip_reading: {e}", flush=True)
         import traceback
         traceback.print_exc()
-        # Remove the STARTING sentinel if we failed to start
-        if _threads.get('lip_reading_proc') == "STARTING":
-            _threads.pop('lip_reading_proc', None)
-
-    text = read_output_file(output_file)
-    latest_result = {"type": "lip-reading", "text": text or "No output"}
+        return None
 
 
 # --------------------- #
 # HAND GESTURES
 # --------------------- #
-def run_hand_gestures():
-    global latest_result
+def run_hand_gestures(env):
+    """Spawn the long-lived hand gesture worker. It idles until activated over IPC."""
     base_dir = os.path.dirname(__file__)
-    venv_python = os.path.join(base_dir, "venv", "Scripts", "python.exe")
-    if not os.path.exists(venv_python):
-        venv_python = os.path.join(base_dir, "LH", "Scripts", "python.exe")
-    if not os.path.exists(venv_python):
-         venv_python = os.path.join(base_dir, "LH2", "Scripts", "python.exe")
     main_script = os.path.join(base_dir, "hand_gestures", "main.py")
-    output_file = os.path.join(base_dir, "hand_gestures", "output.txt")
-    stop_file = os.path.join(base_dir, "hand_gestures", "stop.txt")
-    frame_file = os.path.join(base_dir, "hand_gestures", "frame.jpg")
-
-    ensure_removed(output_file)
-    ensure_removed(stop_file)
 
-    if not os.path.exists(venv_python):
-        print("⚠️  venv python not found, will fallback to system python if available:", venv_python)
-
-    logs_dir = os.path.join(base_dir, "logs")
-    os.makedirs(logs_dir, exist_ok=True)
-    log_path = os.path.join(logs_dir, "hand_gestures.log")
     try:
-        print("▶️ Starting Hand Gesture subprocess (Popen)...")
-        with open(log_path, "a", encoding="utf-8") as lf:
-            python_exec = venv_python if os.path.exists(venv_python) else sys.executable
-            print(f"[DEBUG] hand_gestures will use python_exec={python_exec}")
-            cmd = [python_exec, main_script]
-            proc = subprocess.Popen(cmd, stdout=lf, stderr=subprocess.STDOUT, cwd=os.path.dirname(main_script))
-            _threads['hand_gestures_proc'] = proc
-            print(f"HandGesture Popen started pid={proc.pid}")
-            # create a small placeholder frame so frontend has something to display immediately
-            try:
-                import numpy as _np
-                placeholder = _np.zeros((240, 320, 3), dtype=_np.uint8)
-                try:
-                    import cv2 as _cv2
-                    _cv2.putText(placeholder, 'Starting...', (10, 120), _cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-                except Exception:
-                    pass
-                # Try Pillow first for reliable JPEG writing
-                try:
-                    from PIL import Image as _Image
-                    im = _Image.fromarray(placeholder[:, :, ::-1])
-                    tmp = frame_file + ".tmp"
-                    im.save(tmp, format='JPEG', quality=85)
-                    try:
-                        os.replace(tmp, frame_file)
-                    except Exception:
-                        os.rename(tmp, frame_file)
-                except Exception:
-                    try:
-                        import cv2 as _cv2
-                        _cv2.imwrite(frame_file, placeholder)
-                    except Exception as e:
-                        print('[WARN] Could not write placeholder frame:', e)
-            except Exception as e:
-                print('[WARN] Could not write placeholder frame:', e)
+        print("▶️ Starting Hand Gesture worker (Popen)...")
+        python_exec = worker_python()
+        print(f"[DEBUG] hand_gestures will use python_exec={python_exec}")
+        cmd = [python_exec, "-u", main_script]
+        env['PYTHONIOENCODING'] = 'utf-8'
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace",
+                                cwd=os.path.dirname(main_script), env=env)
+        log_ring.follow(proc.stdout, log_component("hand_gestures", env))
+        print(f"HandGesture Popen started pid={proc.pid}")
+        return proc
     except Exception as e:
         print("❌ Hand gesture error:", e)
-        # Remove the STARTING sentinel if we failed to start
-        if _threads.get('hand_gestures_proc') == "STARTING":
-            _threads.pop('hand_gestures_proc', None)
+        return None
+
+
+# --------------------- #
+# CAMERA SESSIONS
+# --------------------- #
+WORKER_SPAWNERS = {
+    "lip_reading": run_lip_reading,
+    "hand_gestures": run_hand_gestures,
+}
 
-    text = read_output_file(output_file)
-    latest_result = {"type": "hand-gesture", "text": text or "No output"}
+# One capture -> recognition -> results pipeline per camera
+sessions = SessionRegistry(lambda session_id, device: CameraSession(
+    session_id, device, WORKER_SPAWNERS, metrics=metrics, tracer=tracer, history=history))
+default_session = sessions.create(DEFAULT_SESSION, 0)
+atexit.register(sessions.close_all)
+
+# The original single-camera names; the routes below and asgi.py use them
+frame_rings = default_session.frame_rings
+frame_hubs = default_session.frame_hubs
+result_bus = default_session.result_bus
+worker_pool = default_session.worker_pool
 
 
 # --------------------- #
@@ -202,289 +149,274 @@ def home():
     return jsonify({"message": "Backend running successfully 🚀"})
 
 
+def activation_response(session, name, started_message):
+    """Switch a session to one mode and report how it went (200 active, 202 still warming up, 503 failed)."""
+    ok, detail = session.start(name)
+    if not ok:
+        workers = session.worker_pool.status()
+        return jsonify({"status": "failed", "error": detail,
+                        "worker": workers if name == COMBINED else workers[name]}), 503
+    if detail == "starting":
+        return jsonify({"status": f"{started_message} (worker still loading)"}), 202
+    return jsonify({"status": started_message})
+
+
 @app.route("/start_lip_reading", methods=["GET"])
 def start_lip_reading():
     print(f"Received /start_lip_reading request. CWD: {os.getcwd()}", file=sys.stderr)
-    
-    # 1. Stop Hand Gestures if running (Critical for camera release)
-    if 'hand_gestures_proc' in _threads:
-        print("[INFO] Stopping active hand_gestures_proc before starting lip reading...")
-        stop_hand_gestures()
-        time.sleep(1.5) # Give it time to release camera
-
-    # 2. Mark as STARTING
-    _threads["lip_reading_proc"] = "STARTING"
-
-    # 3. Cleanup output
-    base_dir = os.path.dirname(__file__)
-    other_output = os.path.join(base_dir, "hand_gestures", "output.txt")
-    ensure_removed(other_output)
-    output_file = os.path.join(base_dir, "Lip-Reading", "output.txt")
-    ensure_removed(output_file)
-
-    # 4. Release global camera if held
-    global camera
-    if camera is not None:
-        if camera.isOpened():
-            camera.release()
-        camera = None
-        print("[INFO] Released global camera for Lip Reading", file=sys.stderr)
-        time.sleep(1.0)
-
-    # 5. Start Lip Reading
-    t = threading.Thread(target=run_lip_reading, daemon=True)
-    t.start()
-    return jsonify({"status": "Lip Reading started"})
+    return activation_response(default_session, "lip_reading", "Lip Reading started")
 
 
 @app.route("/stop_lip_reading", methods=["GET"])
 def stop_lip_reading():
-    base_dir = os.path.dirname(__file__)
-    stop_file = os.path.join(base_dir, "Lip-Reading", "stop.txt")
     try:
-        os.makedirs(os.path.dirname(stop_file), exist_ok=True)
-        with open(stop_file, "w") as f:
-            f.write("stop")
-        
-        # Terminate process
-        proc = _threads.get('lip_reading_proc')
-        if proc and proc != "STARTING":
-            try:
-                proc.terminate()
-                proc.wait(timeout=2)
-            except:
-                try: proc.kill()
-                except: pass
-            _threads.pop('lip_reading_proc', None)
-            
-        return jsonify({"status": "stop signal written for lip reading"})
+        default_session.stop("lip_reading")
+        return jsonify({"status": "stop signal sent for lip reading"})
     except Exception as e:
         return jsonify({"status": "failed", "error": str(e)}), 500
 
 
 @app.route("/start_hand_gestures", methods=["GET"])
 def start_hand_gestures():
-    # 1. Stop Lip Reading if running
-    if 'lip_reading_proc' in _threads:
-        print("[INFO] Stopping active lip_reading_proc before starting hand gestures...")
-        stop_lip_reading()
-        time.sleep(1.5)
-
-    # 2. Mark as STARTING
-    _threads["hand_gestures_proc"] = "STARTING"
-
-    # 3. Cleanup output
-    base_dir = os.path.dirname(__file__)
-    other_output = os.path.join(base_dir, "Lip-Reading", "output.txt")
-    ensure_removed(other_output)
-    output_file = os.path.join(base_dir, "hand_gestures", "output.txt")
-    ensure_removed(output_file)
-
-    # 4. Release global camera
-    global camera
-    if camera is not None:
-        if camera.isOpened():
-            camera.release()
-        camera = None
-        print("[INFO] Released global camera for Hand Gestures", file=sys.stderr)
-        time.sleep(1.0)
-
-    # 5. Start Hand Gestures
-    t = threading.Thread(target=run_hand_gestures, daemon=True)
-    t.start()
-    return jsonify({"status": "Hand Gesture recognition started"})
+    return activation_response(default_session, "hand_gestures", "Hand Gesture recognition started")
 
 
 @app.route("/stop_hand_gestures", methods=["GET"])
 def stop_hand_gestures():
-    base_dir = os.path.dirname(__file__)
-    stop_file = os.path.join(base_dir, "hand_gestures", "stop.txt")
     try:
-        os.makedirs(os.path.dirname(stop_file), exist_ok=True)
-        with open(stop_file, "w") as f:
-            f.write("stop")
-        # also try to terminate the subprocess if it was started
-        try:
-            proc = _threads.get('hand_gestures_proc')
-            if proc is not None:
-                print(f"[INFO] Attempting to terminate hand_gestures proc pid={getattr(proc, 'pid', None)}")
-                try:
-                    proc.terminate()
-                    proc.wait(timeout=2)
-                except Exception:
-                    try:
-                        proc.kill()
-                    except Exception:
-                        pass
-        except Exception as e:
-            print('[WARN] Failed to terminate hand_gestures subprocess:', e)
-        return jsonify({"status": "stop signal written for hand gestures"})
+        default_session.stop("hand_gestures")
+        return jsonify({"status": "stop signal sent for hand gestures"})
     except Exception as e:
         return jsonify({"status": "failed", "error": str(e)}), 500
 
 
-@app.route("/latest_result", methods=["GET"])
-def get_latest_result():
-    # Prefer reading the hand gesture output file (most recent), then lip reading.
-    base_dir = os.path.dirname(__file__)
-    hg_out = os.path.join(base_dir, "hand_gestures", "output.txt")
-    lr_out = os.path.join(base_dir, "Lip-Reading", "output.txt")
+@app.route("/start_combined", methods=["GET"])
+def start_combined():
+    """Hand gestures and lip reading at once on the same camera frames; results share /result_stream."""
+    return activation_response(default_session, COMBINED, "Combined gesture and lip reading started")
 
-    # If hand gesture output exists and has content, return it
-    try:
-        if os.path.exists(hg_out):
-            text = read_output_file(hg_out)
-            # Parse "Recognized Gesture: X" format to extract just the gesture name
-            if text and text.startswith("Recognized Gesture:"):
-                gesture_name = text.replace("Recognized Gesture:", "").strip()
-                return jsonify({"type": "hand-gesture", "text": gesture_name or "No output"})
-            return jsonify({"type": "hand-gesture", "text": text or "No output"})
-    except Exception as e:
-        print('[WARN] Error reading hand gesture output:', e)
 
-    # Otherwise check lip reading
+@app.route("/stop_combined", methods=["GET"])
+def stop_combined():
     try:
-        if os.path.exists(lr_out):
-            text = read_output_file(lr_out)
-            return jsonify({"type": "lip-reading", "text": text or "No output"})
+        default_session.stop(COMBINED)
+        return jsonify({"status": "stop signal sent for combined recognition"})
     except Exception as e:
-        print('[WARN] Error reading lip reading output:', e)
+        return jsonify({"status": "failed", "error": str(e)}), 500
 
-    # Fallback to the in-memory latest_result if present
-    return jsonify(latest_result)
 
+@app.route("/worker_status", methods=["GET"])
+def worker_status():
+    return jsonify(worker_pool.status())
 
-# --------------------- #
-# VIDEO STREAM ROUTE
-# --------------------- #
-camera = None
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Frame counters, fps and per-stage latency histograms for the server and each worker."""
+    return jsonify(metrics.snapshot())
 
-# --------------------- #
-# Helper to open camera
-# --------------------- #
-def open_camera(device=0, retries=3, delay=0.5):
+
+@app.route("/trace/start", methods=["POST"])
+def trace_start():
+    """Start recording per-frame spans (server and workers) into a fresh buffer."""
+    tracer.clear()
+    tracer.enabled = True
+    for session in sessions.all():
+        session.worker_pool.set_tracing(True)
+    return jsonify({"status": "tracing", **tracer.status()})
+
+
+@app.route("/trace/stop", methods=["POST"])
+def trace_stop():
+    tracer.enabled = False
+    for session in sessions.all():
+        session.worker_pool.set_tracing(False)
+    return jsonify({"status": "stopped", **tracer.status()})
+
+
+@app.route("/trace", methods=["GET"])
+def trace_download():
+    """The trace buffer as a Chrome trace file (open in ui.perfetto.dev or chrome://tracing).
+
+    ?save=1 also writes it to logs/trace-<time>.json.
     """
-    Robust camera opener.
-    Iterates indices 0..2.
-    Tries DSHOW, MSMF, ANY.
-    Sets resolution to 640x480 to minimize bandwidth issues.
+    names = {}
+    for session in sessions.all():
+        names.update(session.worker_pool.process_names())
+    if request.args.get("save"):
+        path = os.path.join(os.path.dirname(__file__), "logs", time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        tracer.write(path, names)
+        print(f"[INFO] Trace written to {path}")
+    return Response(json.dumps(tracer.to_chrome(names)), mimetype="application/json",
+                    headers={"Content-Disposition": "attachment; filename=bolt-trace.json"})
+
+
+@app.route("/history", methods=["GET"])
+def history_page():
+    """Recorded results, newest first: ?limit=50&before=<next_cursor>&mode=&session=&since=&until="""
+    try:
+        before = request.args.get("before")
+        before = int(before) if before else None
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+        since = request.args.get("since")
+        since = float(since) if since else None
+        until = request.args.get("until")
+        until = float(until) if until else None
+    except ValueError:
+        return jsonify({"status": "failed", "error": "before/limit must be integers, since/until unix times"}), 400
+    return jsonify(history.page(before=before, limit=limit, mode=request.args.get("mode"),
+                                session=request.args.get("session"), since=since, until=until))
+
+
+@app.route("/batch", methods=["POST"])
+def batch_process():
+    """Run recognition over an uploaded video (multipart field "video", ?mode=hand-gesture|lip-reading).
+
+    Streams newline-delimited JSON events from batch.py as they are produced.
     """
-    # If device is 0, we'll try 0, 1, 2. If it's specific, we just try that.
-    target_indices = [device] if device != 0 else [0, 1, 2]
-    backends = [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
-    
-    for index in target_indices:
-        for attempt in range(retries):
-            for backend in backends:
-                try:
-                    cap = cv2.VideoCapture(index, backend)
-                    if cap.isOpened():
-                        # Optimize for compatibility
-                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                        
-                        # Warmup read
-                        ret, frame = cap.read()
-                        if ret and frame is not None:
-                            print(f"[INFO] Camera opened on index {index} with backend {backend}")
-                            return cap
-                        else:
-                            cap.release()
-                except Exception as e:
-                    # print(f"[WARN] Camera open failed on index {index}: {e}")
-                    pass
-            time.sleep(delay)
-    
-    print("[ERROR] Failed to open camera on any index/backend.")
-    return None
-
-def generate_frames():
-    global camera
+    mode = request.args.get("mode") or request.form.get("mode") or "hand-gesture"
+    if mode not in ("hand-gesture", "lip-reading"):
+        return jsonify({"status": "failed", "error": "mode must be hand-gesture or lip-reading"}), 400
+    workers = request.args.get("workers")
+    if workers:
+        max_workers = os.cpu_count() or 1
+        try:
+            workers = int(workers)
+        except ValueError:
+            workers = 0
+        if not 1 <= workers <= max_workers:
+            return jsonify({"status": "failed", "error": f"workers must be an integer between 1 and {max_workers}"}), 400
+    upload = request.files.get("video")
+    if upload is None:
+        return jsonify({"status": "failed", "error": "no video uploaded (multipart field 'video')"}), 400
+    fd, path = tempfile.mkstemp(prefix="bolt-batch-", suffix=os.path.splitext(upload.filename or "")[1] or ".mp4")
+    with os.fdopen(fd, "wb") as f:
+        upload.save(f)
+
     base_dir = os.path.dirname(__file__)
-    
-    # Define frame paths
-    hg_frame = os.path.join(base_dir, "hand_gestures", "frame.jpg")
-    lr_frame = os.path.join(base_dir, "Lip-Reading", "frame.jpg")
+    cmd = [worker_python(), "-u", os.path.join(base_dir, "batch.py"), path, "--mode", mode]
+    if workers:
+        cmd += ["--workers", str(workers)]
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                encoding="utf-8", errors="replace", cwd=base_dir, env=env)
+    except Exception as e:
+        os.remove(path)
+        return jsonify({"status": "failed", "error": str(e)}), 500
+    log_ring.follow(proc.stderr, "batch")
+    print(f"[INFO] Batch {mode} job pid={proc.pid} on {upload.filename}")
 
-    while True:
+    def gen():
         try:
-            # Check for active subprocesses
-            # We use the global _threads dict to check if processes are alive
-            lr_active = False
-            if 'lip_reading_proc' in _threads:
-                proc = _threads['lip_reading_proc']
-                if proc == "STARTING":
-                    lr_active = True
-                elif proc and hasattr(proc, 'poll') and proc.poll() is None:
-                    lr_active = True
-
-            hg_active = False
-            if 'hand_gestures_proc' in _threads:
-                proc = _threads['hand_gestures_proc']
-                if proc == "STARTING":
-                    hg_active = True
-                elif proc and hasattr(proc, 'poll') and proc.poll() is None:
-                    hg_active = True
-
-            frame_data = None
-            
-            # 1. Lip Reading Priority
-            if lr_active:
-                if os.path.exists(lr_frame):
-                    try:
-                        with open(lr_frame, 'rb') as f:
-                            frame_data = f.read()
-                    except Exception:
-                        pass
-            
-            # 2. Hand Gesture Priority
-            elif hg_active:
-                 if os.path.exists(hg_frame):
-                    try:
-                        with open(hg_frame, 'rb') as f:
-                            frame_data = f.read()
-                    except Exception:
-                        pass
-            
-            if frame_data:
-                # If we have a frame from a subprocess, yield it
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n')
-                # Sleep briefly to mimic frame rate
-                time.sleep(0.04) 
-                
-            # 3. Fallback to Camera only if NO subprocess is active
-            elif not lr_active and not hg_active:
-                if camera is None:
-                    camera = open_camera(0)
-                
-                if camera is None or not camera.isOpened():
-                     # Try to re-open if closed OR if failed initially
-                     if camera is not None:
-                         camera.release()
-                     camera = open_camera(0)
-
-                if camera is None:
-                    time.sleep(0.5)
-                    continue
+            for line in proc.stdout:
+                yield line
+        finally:
+            # client gone or job finished: never leave the pool running
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return Response(gen(), mimetype="application/x-ndjson")
+
+
+@app.route("/history/sessions", methods=["GET"])
+def history_sessions():
+    return jsonify(history.sessions())
+
+
+def latest_result_payload():
+    """Most recent recognition result as a dict (shared by the WSGI and ASGI routes)."""
+    return default_session.latest_result_payload()
+
+
+@app.route("/latest_result", methods=["GET"])
+def get_latest_result():
+    return jsonify(latest_result_payload())
+
+
+def result_stream_start(last_event_id, bus=None):
+    """Sequence number an SSE client should resume after."""
+    bus = bus or result_bus
+    try:
+        after = int(last_event_id)
+    except (TypeError, ValueError):
+        return bus.seq
+    # ids from before a server restart are meaningless; start fresh
+    return after if 0 <= after <= bus.seq else bus.seq
+
 
-                success, frame = camera.read()
-                if not success or frame is None:
-                    time.sleep(0.05)
+@app.route("/result_stream", methods=["GET"])
+def result_stream():
+    """Server-Sent Events stream with one `result` event per recognized gesture or word.
+
+    Reconnecting clients resume from the Last-Event-ID header (or ?since=).
+    """
+    return result_stream_response(result_bus)
+
+
+def result_stream_response(bus):
+    after = result_stream_start(request.headers.get("Last-Event-ID") or request.args.get("since"), bus)
+
+    def gen():
+        after_seq = after
+        while True:
+            try:
+                events = bus.wait_for(after_seq, timeout=15.0)
+                if not events:
+                    yield SSE_KEEPALIVE
                     continue
-                
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                else:
-                    time.sleep(0.05)
-            else:
-                 # Subprocess is active but no frame yet -> wait
-                 time.sleep(0.05)
+                for event in events:
+                    after_seq = event["seq"]
+                    yield sse_message(event)
+            except GeneratorExit:
+                break
+
+    return Response(gen(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --------------------- #
+# VIDEO STREAM ROUTE
+# --------------------- #
+def current_feed_hub():
+    """Hub /video_feed should follow right now (see CameraSession.current_feed_hub)."""
+    return default_session.current_feed_hub()
+
 
+def generate_frames(rendition=None, max_fps=None, session=None):
+    sent = {}  # last sequence number sent to this client, per hub
+    min_interval = 1.0 / max_fps if max_fps else 0.0
+    next_due = 0.0
+    while True:
+        try:
+            # Honour the client's max fps before waiting for the next frame
+            if min_interval:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            hub = (session or default_session).current_feed_hub()
+
+            # Block until the producer publishes a frame this client has not
+            # seen yet; the timeout only bounds how long a mode switch goes
+            # unnoticed.
+            frame = hub.wait_for(sent.get(hub.name, 0), timeout=0.5)
+            if frame is not None:
+                last = sent.get(hub.name, 0)
+                if last and frame.seq > last + 1:
+                    metrics.count("stream", "frames_skipped", frame.seq - last - 1)
+                sent[hub.name] = frame.seq
+                next_due = time.monotonic() + min_interval
+                part = mjpeg_part(hub.render(frame, rendition))
+                send_start = time.perf_counter()
+                yield part
+                # the generator resumes once the server has written the part out
+                metrics.observe("stream", "send", time.perf_counter() - send_start)
+                metrics.count("stream", "frames_sent")
 
         except GeneratorExit:
             # client disconnected
@@ -495,32 +427,46 @@ def generate_frames():
 
 @app.route("/video_feed")
 def video_feed():
-    """Stream webcam feed to frontend"""
-    return Response(generate_frames(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    """Stream webcam feed to frontend.
+
+    Optional query args: width, height, quality (JPEG 10-95) and fps (max
+    frames per second), e.g. /video_feed?width=160&quality=60&fps=5 for a
+    thumbnail.
+    """
+    try:
+        rendition, max_fps = parse_stream_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "failed", "error": str(e)}), 400
+    return Response(generate_frames(rendition, max_fps), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
 @app.route("/video_feed_lip")
 def video_feed_lip():
-    """Stream the MJPEG frames produced by the lip-reading subprocess."""
-    base_dir = os.path.dirname(__file__)
-    frame_file = os.path.join(base_dir, "Lip-Reading", "frame.jpg")
+    """Stream the MJPEG frames produced by the lip-reading subprocess.
+
+    Accepts the same width/height/quality/fps query args as /video_feed.
+    """
+    try:
+        rendition, max_fps = parse_stream_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "failed", "error": str(e)}), 400
+    hub = frame_hubs["lip_reading"]
+    min_interval = 1.0 / max_fps if max_fps else 0.0
 
     def gen():
+        last_seq = 0
+        next_due = 0.0
         while True:
             try:
-                if os.path.exists(frame_file):
-                    try:
-                        with open(frame_file, "rb") as f:
-                            data = f.read()
-                        yield (
-                            b'--frame\r\n'
-                            b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n'
-                        )
-                    except Exception:
-                        time.sleep(0.05)
-                        continue
-                else:
-                    time.sleep(0.05)
+                if min_interval:
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                frame = hub.wait_for(last_seq, timeout=1.0)
+                if frame is not None:
+                    last_seq = frame.seq
+                    next_due = time.monotonic() + min_interval
+                    yield mjpeg_part(hub.render(frame, rendition))
             except GeneratorExit:
                 break
             except Exception:
@@ -529,32 +475,168 @@ def video_feed_lip():
     return Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
+def snapshot_response(session):
+    """The session's current preview frame as a single JPEG.
+
+    The ETag changes with every published frame: a matching If-None-Match
+    gets a 304, or, with ?wait=<s>, waits up to that long for the next frame
+    (304 if none arrives). Accepts the width/height/quality args of /video_feed.
+    """
+    try:
+        rendition, _ = parse_stream_args(request.args)
+        wait = parse_snapshot_wait(request.args)
+    except ValueError as e:
+        return jsonify({"status": "failed", "error": str(e)}), 400
+
+    hub = session.current_feed_hub()
+    frame = hub.fresh()
+    if frame is None:
+        return jsonify({"status": "failed", "error": "no frame available yet"}), 503, {"Retry-After": "1"}
+    etag = snapshot_etag(hub.name, frame, rendition)
+    if_none_match = request.headers.get("If-None-Match")
+    if wait and etag_matches(if_none_match, etag):
+        newer = hub.wait_for(frame.seq, timeout=wait)
+        if newer is not None:
+            frame, etag = newer, snapshot_etag(hub.name, newer, rendition)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        metrics.count("stream", "snapshots_not_modified")
+        return Response(status=304, headers=headers)
+    headers["X-Frame-Seq"] = str(frame.seq)
+    headers["X-Frame-Timestamp"] = f"{frame.timestamp:.3f}"
+    metrics.count("stream", "snapshots_sent")
+    return Response(hub.render(frame, rendition), mimetype="image/jpeg", headers=headers)
+
+
+@app.route("/snapshot")
+def snapshot():
+    """Latest preview frame as a JPEG (see snapshot_response)."""
+    return snapshot_response(default_session)
+
+
+# --------------------- #
+# CAMERA SESSION ROUTES
+# --------------------- #
+def session_or_404(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return None, (jsonify({"status": "failed", "error": f"no session {session_id}"}), 404)
+    return session, None
+
+
+@app.route("/sessions", methods=["GET"])
+def list_sessions():
+    return jsonify([session.status() for session in sessions.all()])
+
+
+@app.route("/sessions", methods=["POST"])
+def create_session():
+    """Start serving another camera: {"camera": 1, "id": "kiosk1"} (id defaults to cam<camera>)."""
+    body = request.get_json(silent=True) or request.form
+    try:
+        device = int(body.get("camera"))
+    except (TypeError, ValueError):
+        return jsonify({"status": "failed", "error": "camera must be a device index"}), 400
+    try:
+        session = sessions.create(str(body.get("id") or f"cam{device}"), device)
+    except ValueError as e:
+        return jsonify({"status": "failed", "error": str(e)}), 409
+    session.worker_pool.prewarm()
+    return jsonify(session.status()), 201
+
+
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+    if session_id == DEFAULT_SESSION:
+        return jsonify({"status": "failed", "error": "the default session cannot be removed"}), 400
+    if not sessions.remove(session_id):
+        return jsonify({"status": "failed", "error": f"no session {session_id}"}), 404
+    return jsonify({"status": "removed", "session": session_id})
+
+
+@app.route("/sessions/<session_id>/start/<mode>", methods=["GET"])
+def start_session_mode(session_id, mode):
+    session, error = session_or_404(session_id)
+    if error:
+        return error
+    if mode not in MODES and mode != COMBINED:
+        return jsonify({"status": "failed", "error": f"mode must be one of {', '.join([*MODES, COMBINED])}"}), 400
+    return activation_response(session, mode, f"{mode} started on {session_id}")
+
+
+@app.route("/sessions/<session_id>/stop/<mode>", methods=["GET"])
+def stop_session_mode(session_id, mode):
+    session, error = session_or_404(session_id)
+    if error:
+        return error
+    if mode not in MODES and mode != COMBINED:
+        return jsonify({"status": "failed", "error": f"mode must be one of {', '.join([*MODES, COMBINED])}"}), 400
+    session.stop(mode)
+    return jsonify({"status": f"stop signal sent for {mode} on {session_id}"})
+
+
+@app.route("/sessions/<session_id>/status", methods=["GET"])
+def session_status(session_id):
+    session, error = session_or_404(session_id)
+    return error or jsonify(session.status())
+
+
+@app.route("/sessions/<session_id>/latest_result", methods=["GET"])
+def session_latest_result(session_id):
+    session, error = session_or_404(session_id)
+    return error or jsonify(session.latest_result_payload())
+
+
+@app.route("/sessions/<session_id>/result_stream", methods=["GET"])
+def session_result_stream(session_id):
+    session, error = session_or_404(session_id)
+    return error or result_stream_response(session.result_bus)
+
+
+@app.route("/sessions/<session_id>/video_feed", methods=["GET"])
+def session_video_feed(session_id):
+    """Like /video_feed, for one camera session."""
+    session, error = session_or_404(session_id)
+    if error:
+        return error
+    try:
+        rendition, max_fps = parse_stream_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "failed", "error": str(e)}), 400
+    return Response(generate_frames(rendition, max_fps, session), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.route("/sessions/<session_id>/snapshot", methods=["GET"])
+def session_snapshot(session_id):
+    """Like /snapshot, for one camera session."""
+    session, error = session_or_404(session_id)
+    if error:
+        return error
+    return snapshot_response(session)
+
+
 # --------------------- #
 # START FLASK APP
 # --------------------- #
 @app.route("/debug_logs", methods=["GET"])
 def debug_logs():
-    base_dir = os.path.dirname(__file__)
-    logs_dir = os.path.join(base_dir, "logs")
-    
-    logs = {}
-    for log_file in ["hand_gestures.log", "lip_reading.log"]:
-        path = os.path.join(logs_dir, log_file)
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    # Read last 2KB to avoid huge payloads
-                    f.seek(0, 2)
-                    size = f.tell()
-                    f.seek(max(0, size - 4000), 0)
-                    logs[log_file] = f.read()
-            except Exception as e:
-                logs[log_file] = f"Error reading log: {str(e)}"
-        else:
-            logs[log_file] = "File not found"
-            
-    return jsonify(logs)
+    """Recent log records, oldest first: ?since=<next>&level=WARN&component=lip_reading&limit=200"""
+    try:
+        since = int(request.args.get("since", 0))
+        limit = max(1, min(int(request.args.get("limit", 200)), 1000))
+    except ValueError:
+        return jsonify({"status": "failed", "error": "since and limit must be integers"}), 400
+    level = request.args.get("level")
+    if level and level.upper() not in LEVELS:
+        return jsonify({"status": "failed", "error": f"level must be one of {', '.join(LEVELS)}"}), 400
+    return jsonify(log_ring.query(since=since, level=level,
+                                  component=request.args.get("component"), limit=limit))
 
 if __name__ == "__main__":
     print("Starting backend on 0.0.0.0:5000")
+    # With the debug reloader only the child process serves requests; warm the
+    # workers there so the parent does not spawn a second set.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        worker_pool.prewarm()
     app.run(host="0.0.0.0", port=5000, debug=True)
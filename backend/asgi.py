@@ -0,0 +1,212 @@
+"""
+Asyncio (ASGI) serving mode for the BOLT backend.
+
+The MJPEG streams, /snapshot and the result endpoints (including the
+/result_stream Server-Sent Events feed) are served natively as coroutines,
+so hundreds of idle or slow viewers cost parked futures rather than a WSGI
+thread each. Every other route (start/stop, health, debug) is handed to the
+regular Flask app unchanged.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+or simply:
+    python asgi.py
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as backend
+from streaming import SNAPSHOT_MAX_AGE, etag_matches, mjpeg_part, parse_snapshot_wait, parse_stream_args, snapshot_etag
+from results import SSE_KEEPALIVE, sse_message
+
+_flask = WsgiToAsgi(backend.app)
+
+_CORS = [(b"access-control-allow-origin", b"*")]
+
+
+async def _send_json(send, payload, status=200):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + _CORS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _query_args(scope):
+    qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return {k: v[0] for k, v in qs.items()}
+
+
+async def _watch_disconnect(receive, disconnected: asyncio.Event):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+async def _stream(scope, receive, send, select_hub):
+    """MJPEG response that follows ``select_hub()`` until the client goes away."""
+    try:
+        rendition, max_fps = parse_stream_args(_query_args(scope))
+    except ValueError as e:
+        await _send_json(send, {"status": "failed", "error": str(e)}, status=400)
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"multipart/x-mixed-replace; boundary=frame"), (b"cache-control", b"no-cache")] + _CORS,
+    })
+    disconnected = asyncio.Event()
+    watcher = asyncio.ensure_future(_watch_disconnect(receive, disconnected))
+    loop = asyncio.get_running_loop()
+    min_interval = 1.0 / max_fps if max_fps else 0.0
+    next_due = 0.0
+    sent = {}  # last sequence number sent to this client, per hub
+    try:
+        while not disconnected.is_set():
+            if min_interval:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            # select_hub() only reads the WorkerPool's in-memory worker state; cheap enough for the loop
+            hub = select_hub()
+            frame = await hub.wait_for_async(sent.get(hub.name, 0), timeout=0.5)
+            if frame is None:
+                continue
+            last = sent.get(hub.name, 0)
+            if last and frame.seq > last + 1:
+                backend.metrics.count("stream", "frames_skipped", frame.seq - last - 1)
+            sent[hub.name] = frame.seq
+            next_due = time.monotonic() + min_interval
+            if rendition is None:
+                data = frame.data
+            else:
+                # decode/resize/encode is CPU work; keep it off the event loop
+                data = await loop.run_in_executor(None, hub.render, frame, rendition)
+            send_start = time.perf_counter()
+            await send({"type": "http.response.body", "body": mjpeg_part(data), "more_body": True})
+            backend.metrics.observe("stream", "send", time.perf_counter() - send_start)
+            backend.metrics.count("stream", "frames_sent")
+    except (OSError, RuntimeError):
+        pass  # client went away mid-send
+    finally:
+        watcher.cancel()
+
+
+async def _snapshot(scope, receive, send):
+    """Coroutine version of app.snapshot_response for the default session."""
+    args = _query_args(scope)
+    try:
+        rendition, _ = parse_stream_args(args)
+        wait = parse_snapshot_wait(args)
+    except ValueError as e:
+        await _send_json(send, {"status": "failed", "error": str(e)}, status=400)
+        return
+
+    hub = backend.current_feed_hub()
+    frame = hub.latest()
+    if frame is None or time.time() - frame.timestamp > SNAPSHOT_MAX_AGE:
+        frame = await hub.wait_for_async(frame.seq if frame else 0, timeout=2.0) or frame
+    if frame is None:
+        await _send_json(send, {"status": "failed", "error": "no frame available yet"}, status=503)
+        return
+    etag = snapshot_etag(hub.name, frame, rendition)
+    if_none_match = dict(scope.get("headers") or []).get(b"if-none-match", b"").decode("latin-1")
+    if wait and etag_matches(if_none_match, etag):
+        newer = await hub.wait_for_async(frame.seq, timeout=wait)
+        if newer is not None:
+            frame, etag = newer, snapshot_etag(hub.name, newer, rendition)
+
+    headers = [(b"etag", etag.encode("latin-1")), (b"cache-control", b"no-cache")] + _CORS
+    if etag_matches(if_none_match, etag):
+        backend.metrics.count("stream", "snapshots_not_modified")
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if rendition is None:
+        data = frame.data
+    else:
+        data = await asyncio.get_running_loop().run_in_executor(None, hub.render, frame, rendition)
+    headers += [(b"content-type", b"image/jpeg"), (b"content-length", str(len(data)).encode()),
+                (b"x-frame-seq", str(frame.seq).encode()), (b"x-frame-timestamp", f"{frame.timestamp:.3f}".encode())]
+    backend.metrics.count("stream", "snapshots_sent")
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _latest_result(scope, receive, send):
+    await _send_json(send, backend.latest_result_payload())
+
+
+async def _result_stream(scope, receive, send):
+    headers = dict(scope.get("headers") or [])
+    last_id = headers.get(b"last-event-id", b"").decode("latin-1") or _query_args(scope).get("since")
+    after_seq = backend.result_stream_start(last_id)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")] + _CORS,
+    })
+    disconnected = asyncio.Event()
+    watcher = asyncio.ensure_future(_watch_disconnect(receive, disconnected))
+    try:
+        while not disconnected.is_set():
+            events = await backend.result_bus.wait_for_async(after_seq, timeout=15.0)
+            if not events:
+                await send({"type": "http.response.body", "body": SSE_KEEPALIVE, "more_body": True})
+                continue
+            for event in events:
+                after_seq = event["seq"]
+                await send({"type": "http.response.body", "body": sse_message(event), "more_body": True})
+    except (OSError, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+
+
+_ROUTES = {
+    "/video_feed": lambda scope, receive, send: _stream(scope, receive, send, backend.current_feed_hub),
+    "/video_feed_lip": lambda scope, receive, send: _stream(scope, receive, send, lambda: backend.frame_hubs["lip_reading"]),
+    "/snapshot": _snapshot,
+    "/latest_result": _latest_result,
+    "/result_stream": _result_stream,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # spawn the recognition workers now so the first start_* is instant
+            backend.worker_pool.prewarm()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] == "http" and scope.get("method") == "GET":
+        handler = _ROUTES.get(scope["path"])
+        if handler is not None:
+            await handler(scope, receive, send)
+            return
+    await _flask(scope, receive, send)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print("Starting backend (asyncio mode) on 0.0.0.0:5000")
+    uvicorn.run(application, host="0.0.0.0", port=5000)
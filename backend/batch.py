@@ -0,0 +1,254 @@
+"""
+Offline recognition over recorded video files, as fast as the CPU allows.
+
+The video is cut into chunks of consecutive frames. A process pool decodes
+and analyses the chunks in parallel (each pool process seeks to its chunk and
+keeps its own gesture model / dlib models for the whole run), and the
+results are put back in frame order and streamed out as soon as the chunk
+they belong to is done. The MediaPipe hands graph tracks hands from frame to
+frame, so every chunk gets a fresh one: a chunk never starts from the
+tracking state of whichever unrelated chunk that process ran before, and the
+results do not depend on how the chunks were scheduled.
+
+    hand-gesture  pool: decode, hands.process, classify_gesture
+                  result whenever the recognized gesture changes (like the
+                  live worker)
+    lip-reading   pool: decode, face detector, landmarks, lip crop and
+                  preprocessing
+                  here: word segmentation and the Keras word classifier,
+                  which need the frames in order
+
+Usage:
+    python batch.py recording.mp4 --mode hand-gesture [--workers 4] [--chunk 240]
+
+One JSON object is printed per line on stdout:
+    {"kind": "start", "mode": ..., "frames": ..., "fps": ..., "workers": ..., "chunk": ...}
+    {"kind": "result", "type": ..., "text": ..., "confidence": ..., "frame": ..., "time_s": ...}
+    {"kind": "progress", "frames_done": ..., "frames": ...}
+    {"kind": "done", "frames": ..., "elapsed_s": ..., "fps": ...}
+    {"kind": "error", "error": ...}
+Everything else (library chatter, [INFO] lines) goes to stderr.
+
+The server's POST /batch endpoint runs this script and relays its output.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BACKEND_DIR, "hand_gestures"))
+sys.path.append(os.path.join(BACKEND_DIR, "Lip-Reading", "demo"))
+
+MODES = ("hand-gesture", "lip-reading")
+DEFAULT_CHUNK = 240  # frames per pool task; long enough to amortize the seek
+
+# per-process state of the pool workers, set up once by _init_worker
+_state = {}
+
+
+# --------------------- #
+# Pool workers
+# --------------------- #
+def _init_worker(mode: str) -> None:
+    sys.stdout = sys.stderr  # keep stray prints out of the result stream
+    if mode == "hand-gesture":
+        import mediapipe as mp
+        from gestures import load_model
+
+        _state["hands"] = mp.solutions.hands.Hands  # built per chunk, see _gesture_chunk
+        _state["model"] = load_model()
+    else:
+        from lip_pipeline import load_face_models
+
+        _state["detector"], _state["predictor"] = load_face_models()
+
+
+def _read_chunk(path: str, start: int, count: int):
+    """Yield (frame index, BGR frame) for ``count`` frames from ``start``."""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, start + count):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield index, frame
+    finally:
+        cap.release()
+
+
+def _gesture_chunk(path: str, start: int, count: int):
+    """(frames decoded, [(frame index, label, confidence)] for the frames that show a hand)"""
+    import cv2
+    from gestures import LandmarkBuffer, classify_hands
+
+    model = _state["model"]
+    landmarks = LandmarkBuffer()
+    out = []
+    decoded = 0
+    # a new graph per chunk, so hand tracking starts fresh at the chunk's first frame
+    with _state["hands"](min_detection_confidence=0.5, min_tracking_confidence=0.5) as hands:
+        for index, frame in _read_chunk(path, start, count):
+            decoded += 1
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            results = hands.process(image)
+            if not results.multi_hand_landmarks or model is None:
+                continue
+            h, w, _ = frame.shape
+            # the most confident hand, as in the live worker
+            label, confidence = max(classify_hands(landmarks.fill(results.multi_hand_landmarks, w, h), model),
+                                    key=lambda hand: hand[1])
+            out.append((index, label, confidence))
+    return decoded, out
+
+
+def _lip_chunk(path: str, start: int, count: int):
+    """(frames decoded, [(frame index, [(lip crop, lip distance) per face])])"""
+    import cv2
+    from lip_pipeline import crop_lips
+
+    detector, predictor = _state["detector"], _state["predictor"]
+    out = []
+    for index, frame in _read_chunk(path, start, count):
+        gray = cv2.cvtColor(src=frame, code=cv2.COLOR_BGR2GRAY)
+        faces = [crop_lips(frame, predictor(image=gray, box=face)) for face in detector(gray)]
+        out.append((index, faces))
+    return len(out), out
+
+
+# --------------------- #
+# Driver
+# --------------------- #
+def probe(path: str):
+    """(frame count, fps) of a video file; the count is 0 when the container does not say."""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open video {path}")
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    finally:
+        cap.release()
+
+
+def process_video(path: str, mode: str, workers: Optional[int] = None,
+                  chunk: int = DEFAULT_CHUNK) -> Iterator[dict]:
+    """Run one pipeline over a video file; yields the events described in the module docstring."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    started = time.perf_counter()
+    total, fps = probe(path)
+    workers = max(1, workers or (os.cpu_count() or 2) - 1)
+    if total <= 0:
+        chunks = [(0, sys.maxsize)]  # unknown length: one pass to the end
+        workers = 1
+    else:
+        chunks = [(start, min(chunk, total - start)) for start in range(0, total, chunk)]
+    yield {"kind": "start", "mode": mode, "frames": total, "fps": fps, "workers": workers, "chunk": chunk}
+
+    task = _gesture_chunk if mode == "hand-gesture" else _lip_chunk
+    on_chunk = _GestureResults(fps) if mode == "hand-gesture" else _LipResults(fps)
+    done = 0
+    # spawn: the pool processes must not inherit TensorFlow / MediaPipe state from this one
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(mode,)) as pool:
+        pending = deque()
+        queued = iter(chunks)
+        for start, count in queued:
+            pending.append(pool.submit(task, path, start, count))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            decoded, frames = pending.popleft().result()
+            nxt = next(queued, None)
+            if nxt is not None:
+                pending.append(pool.submit(task, path, *nxt))
+            yield from on_chunk(frames)
+            done += decoded
+            yield {"kind": "progress", "frames_done": done, "frames": total}
+
+    elapsed = time.perf_counter() - started
+    yield {"kind": "done", "frames": done, "elapsed_s": round(elapsed, 3),
+           "fps": round(done / elapsed, 1) if elapsed > 0 else None}
+
+
+class _GestureResults:
+    """Emits a result whenever the gesture changes, across chunk boundaries."""
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.last = None
+
+    def __call__(self, frames):
+        for index, label, confidence in frames:
+            if label != self.last:
+                self.last = label
+                yield _result("hand-gesture", label, confidence, index, self.fps)
+
+
+class _LipResults:
+    """Segments words from the ordered lip crops and classifies each one."""
+
+    def __init__(self, fps: float):
+        from lip_pipeline import WordSegmenter, build_model
+
+        self.fps = fps
+        self.model = build_model()
+        self.segmenter = WordSegmenter()
+        self.spoken_already = []
+
+    def __call__(self, frames):
+        from lip_pipeline import label_dict, predict_word
+
+        for index, faces in frames:
+            for lip_frame, lip_distance in faces:
+                clip = self.segmenter.feed(lip_frame, lip_distance)
+                if clip is None:
+                    continue
+                label, confidence, _ = predict_word(self.model, clip, self.spoken_already)
+                self.spoken_already.append(label)
+                if len(self.spoken_already) >= len(label_dict):
+                    self.spoken_already = []  # every word used up; start over rather than loop forever
+                yield _result("lip-reading", label, confidence, index, self.fps)
+
+
+def _result(type_: str, text: str, confidence: float, index: int, fps: float) -> dict:
+    return {"kind": "result", "type": type_, "text": str(text), "confidence": round(float(confidence), 4),
+            "frame": index, "time_s": round(index / fps, 3) if fps else None}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run gesture or lip-reading recognition over a video file.")
+    parser.add_argument("video")
+    parser.add_argument("--mode", choices=MODES, default="hand-gesture")
+    parser.add_argument("--workers", type=int, default=None, help="pool processes (default: CPU count - 1)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="frames per pool task")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout
+    sys.stdout = sys.stderr  # only events go to the real stdout
+    try:
+        for event in process_video(args.video, args.mode, args.workers, max(1, args.chunk)):
+            out.write(json.dumps(event) + "\n")
+            out.flush()
+    except Exception as e:
+        out.write(json.dumps({"kind": "error", "error": str(e)}) + "\n")
+        out.flush()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
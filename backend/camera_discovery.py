@@ -0,0 +1,203 @@
+"""
+Shared camera discovery for the server and the worker scripts.
+
+Opening a camera used to mean walking indices 0..2 x backends
+(DSHOW, MSMF, ANY) one after another, with retries and sleeps, in three
+different copies of the same function. Now:
+
+  1. the last working (index, backend, resolution) is remembered in
+     camera_cache.json and tried first, so a normal start opens the
+     device on the first attempt;
+  2. if that fails, the remaining indices are probed concurrently (one
+     thread per index, backends tried in order within it, since most
+     drivers will not let two backends hold the same device at once).
+     The lowest working index wins: a higher one is only taken once every
+     lower probe has failed or run out of time, so the same camera is
+     picked (and cached) on every start;
+  3. the whole search is bounded by a hard deadline.
+
+Unless BOLT_CAMERA_LOW_LATENCY=0, the device is asked for MJPG and a
+one-frame driver buffer, so a slow consumer never works through a queue of
+stale frames. Backends that do not support either setting ignore it.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, List, Optional, Tuple
+
+import cv2
+
+CACHE_FILE = os.environ.get(
+    "BOLT_CAMERA_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "camera_cache.json"),
+)
+DEFAULT_INDICES = [0, 1, 2]
+DEFAULT_DEADLINE = 5.0
+LOW_LATENCY = os.environ.get("BOLT_CAMERA_LOW_LATENCY", "1") != "0"
+
+if os.name == "nt":
+    BACKENDS = [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
+else:
+    BACKENDS = [cv2.CAP_V4L2, cv2.CAP_ANY]
+
+
+# --------------------- #
+# Cache
+# --------------------- #
+def load_cached() -> Optional[dict]:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        return {"index": int(entry["index"]), "backend": int(entry["backend"]),
+                "width": int(entry["width"]), "height": int(entry["height"])}
+    except Exception:
+        return None
+
+
+def save_cached(index: int, backend: int, width: int, height: int) -> None:
+    tmp = CACHE_FILE + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"index": index, "backend": backend, "width": width, "height": height}, f)
+        os.replace(tmp, CACHE_FILE)
+    except Exception as e:
+        print("[WARN] Could not save camera cache:", e)
+
+
+# --------------------- #
+# Probing
+# --------------------- #
+def _try_open(index: int, backend: int, width: int, height: int):
+    """Open one (index, backend) pair and do a warmup read. Returns (cap, w, h) or None."""
+    try:
+        cap = cv2.VideoCapture(index, backend)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        if LOW_LATENCY:
+            # FOURCC must be set before the resolution on DirectShow
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            cap.release()
+            return None
+        return cap, frame.shape[1], frame.shape[0]
+    except Exception:
+        return None
+
+
+def _probe_index(index: int, backends: List[int], width: int, height: int, found: threading.Event):
+    for backend in backends:
+        if found.is_set():
+            return None
+        opened = _try_open(index, backend, width, height)
+        if opened is not None:
+            return (index, backend) + opened
+    return None
+
+
+def open_camera(device: int = 0, width: int = 640, height: int = 480,
+                deadline: float = DEFAULT_DEADLINE, indices: Optional[List[int]] = None):
+    """Open a camera, trying the cached device first. Returns a VideoCapture or None.
+
+    ``device`` 0 means "any camera" (indices 0..2); any other value limits
+    the search to that index.
+    """
+    return open_camera_index(device, width, height, deadline, indices)[0]
+
+
+def open_camera_index(device: int = 0, width: int = 640, height: int = 480,
+                      deadline: float = DEFAULT_DEADLINE, indices: Optional[List[int]] = None,
+                      exclude: Iterable[int] = ()):
+    """Like open_camera, but returns (VideoCapture or None, index it opened or None).
+
+    Indices in ``exclude`` (cameras other sessions hold) are never tried.
+    """
+    start = time.monotonic()
+    if indices is None:
+        indices = [device] if device != 0 else list(DEFAULT_INDICES)
+    exclude = set(exclude)
+    indices = [index for index in indices if index not in exclude]
+    if not indices:
+        print(f"[ERROR] No camera left to open for device {device}; the others are in use.")
+        return None, None
+
+    cached = load_cached()
+    skip: Tuple[int, int] = (-1, -1)
+    if cached is not None and cached["index"] in indices:
+        opened = _try_open(cached["index"], cached["backend"], cached["width"], cached["height"])
+        if opened is not None:
+            cap, w, h = opened
+            print(f"[INFO] Camera opened on index {cached['index']} with backend {cached['backend']} (cached, {w}x{h})")
+            return cap, cached["index"]
+        print("[WARN] Cached camera did not open; probing all devices.")
+        skip = (cached["index"], cached["backend"])
+
+    found = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(indices), thread_name_prefix="camera-probe")
+    probes = {
+        index: pool.submit(_probe_index, index, [b for b in BACKENDS if (index, b) != skip], width, height, found)
+        for index in sorted(set(indices))
+    }
+    pending = set(probes.values())
+    winner = None
+    try:
+        while pending and winner is None:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            _, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            winner = _lowest_opened(probes, timed_out=False)
+        if winner is None:
+            # out of time: the lower probes still running count as failed
+            winner = _lowest_opened(probes, timed_out=True)
+    finally:
+        found.set()
+        # every other probe releases what it opened; late ones once they see ``found``
+        for fut in probes.values():
+            if fut is not winner:
+                fut.add_done_callback(_release_late)
+        pool.shutdown(wait=False)
+
+    if winner is None:
+        print(f"[ERROR] Failed to open camera on any index/backend within {deadline:.1f}s.")
+        return None, None
+    index, backend, cap, w, h = winner.result()
+    if device == 0:
+        # only the "any camera" search is remembered; an explicit device must
+        # not become the default camera's first guess
+        save_cached(index, backend, w, h)
+    print(f"[INFO] Camera opened on index {index} with backend {backend} ({w}x{h}) in {time.monotonic() - start:.2f}s")
+    return cap, index
+
+
+def _lowest_opened(probes: dict, timed_out: bool):
+    """Probe of the lowest index that opened, once no lower probe is still running.
+
+    With ``timed_out`` the running probes are skipped as failures.
+    """
+    for index in sorted(probes):
+        fut = probes[index]
+        if not fut.done():
+            if timed_out:
+                continue
+            return None
+        if fut.exception() is None and fut.result() is not None:
+            return fut
+    return None
+
+
+def _release_late(fut) -> None:
+    try:
+        result = fut.result()
+    except Exception:
+        return
+    if result is not None:
+        result[2].release()
@@ -0,0 +1,269 @@
+"""
+Single owner of the camera.
+
+The server's CaptureService opens the device once and keeps it for the
+lifetime of the process. Every captured frame is published, raw (BGR), into
+the CAMERA_RING shared-memory ring, where the recognition workers pick it up
+through a CameraReader; the preview hub gets a JPEG of the same frame while no
+worker is active. Switching modes therefore never closes or reopens the
+camera, and nothing waits for a device to be released.
+
+Frames always travel latest-wins: the capture thread keeps the driver
+buffer drained, and a reader that falls behind skips straight to the newest
+frame instead of working through a backlog. LatestFrameCapture gives a worker
+running standalone (straight on the camera) the same behaviour.
+
+Each slot holds a small shape header followed by the pixel data:
+
+    height u16 | width u16 | channels u16 | pixels (height * width * channels bytes)
+"""
+from __future__ import annotations
+
+import struct
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_ring import CAMERA_RING, FrameRing, attach_or_none
+
+# Room for one raw 1280x720 BGR frame per slot; larger frames (a camera that
+# ignores the requested 640x480) are downscaled to fit by CaptureService
+CAPTURE_SLOT_SIZE = 1280 * 720 * 3 + 64
+
+_SHAPE = struct.Struct("<HHH")
+
+
+class CaptureService(threading.Thread):
+    """Read the camera while anyone needs frames and fan them out.
+
+    ``consumers()`` is true while a worker is active; the preview hub's own
+    readers count as consumers too. ``preview()`` decides whether the raw
+    preview should be encoded for the hub (no worker feed to show instead).
+    ``open_camera(device)`` returns (VideoCapture or None, index it opened),
+    like camera_discovery.open_camera_index; ``camera_index`` is the index
+    in use (None while the camera is closed).
+    """
+
+    def __init__(self, open_camera: Callable, ring: FrameRing, hub, consumers: Callable[[], bool],
+                 preview: Callable[[], bool], quality: int = 85, metrics=None,
+                 device: int = 0, component: str = "capture"):
+        super().__init__(name=f"{component}-service", daemon=True)
+        self.open_camera = open_camera
+        self.device = device  # passed to open_camera; 0 = any camera
+        self.camera_index = None
+        self.component = component
+        self.ring = ring
+        self.hub = hub
+        self.consumers = consumers
+        self.preview = preview
+        self.quality = quality
+        self.metrics = metrics  # MetricsRegistry, recorded under ``component``
+        self._camera = None
+        self._stop_event = threading.Event()
+        self._warned_size = None  # frame size we last warned about not fitting the ring
+
+    def run(self):
+        failures = 0
+        while not self._stop_event.is_set():
+            if not self.consumers() and not self.hub.wait_for_readers(timeout=0.1):
+                continue
+            try:
+                if self._camera is None:
+                    self._camera, self.camera_index = self.open_camera(self.device)
+                    if self._camera is None:
+                        time.sleep(1.0)
+                        continue
+                read_start = time.perf_counter()
+                success, frame = self._camera.read()
+                if not success or frame is None:
+                    failures += 1
+                    if failures >= 50:
+                        # device vanished (unplugged, driver reset): start over
+                        print("[WARN] Camera stopped delivering frames; reopening.")
+                        self._release()
+                        failures = 0
+                    time.sleep(0.02)
+                    continue
+                failures = 0
+                captured_at = time.time()
+                if self.metrics is not None:
+                    self.metrics.observe(self.component, "camera_read", time.perf_counter() - read_start)
+                    self.metrics.count(self.component, "frames_captured")
+                frame = np.ascontiguousarray(frame)
+                shared = self._fit_to_ring(frame)
+                h, w = shared.shape[:2]
+                channels = shared.shape[2] if shared.ndim == 3 else 1
+                if not self.ring.write(shared, timestamp=captured_at, header=_SHAPE.pack(h, w, channels)):
+                    if self.metrics is not None:
+                        self.metrics.count(self.component, "frames_unpublished")
+                    if self._warned_size != ("write", shared.shape):
+                        self._warned_size = ("write", shared.shape)
+                        print(f"[ERROR] Camera frame {w}x{h} could not be written to {self.ring.name}; workers get no frames.")
+                if self.hub.readers and self.preview():
+                    encode_start = time.perf_counter()
+                    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                    if self.metrics is not None:
+                        self.metrics.observe(self.component, "jpeg_encode", time.perf_counter() - encode_start)
+                    if ret:
+                        self.hub.publish(buffer.tobytes(), timestamp=captured_at)
+            except Exception as e:
+                print("[ERROR] CaptureService error:", e)
+                time.sleep(0.1)
+
+    def _fit_to_ring(self, frame: np.ndarray) -> np.ndarray:
+        """``frame``, downscaled (keeping its aspect ratio) if it is too big for a ring slot."""
+        capacity = self.ring.slot_size - _SHAPE.size
+        if frame.nbytes <= capacity:
+            return frame
+        h, w = frame.shape[:2]
+        scale = (capacity / frame.nbytes) ** 0.5
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if self._warned_size != frame.shape:
+            self._warned_size = frame.shape
+            print(f"[WARN] Camera delivers {w}x{h}, more than a capture slot holds; "
+                  f"sharing frames downscaled to {size[0]}x{size[1]}.")
+        if self.metrics is not None:
+            self.metrics.count(self.component, "frames_downscaled")
+        return np.ascontiguousarray(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+
+    def _release(self):
+        cam, self._camera = self._camera, None
+        self.camera_index = None
+        if cam is not None:
+            try:
+                cam.release()
+            except Exception:
+                pass
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+        self._release()
+
+
+class CameraReader:
+    """cv2.VideoCapture-like view of the capture service's frames, for the workers.
+
+    ``read()`` returns the newest frame it has not returned before, waiting up
+    to ``timeout`` seconds for one. ``last_timestamp`` is the capture time of
+    the frame it returned last; ``skipped`` counts frames passed over because
+    a newer one was already available. With ``metrics`` (a StageMetrics) the
+    wait for each frame is recorded as "capture" and skips as "frames_dropped".
+    """
+
+    def __init__(self, ring: FrameRing, timeout: float = 1.0, poll: float = 0.002, metrics=None):
+        self._ring = ring
+        self.metrics = metrics
+        self.timeout = timeout
+        self.poll = poll
+        self._last_seq = 0
+        self.last_timestamp = 0.0
+        self.skipped = 0
+
+    @classmethod
+    def attach_or_none(cls, name: str = CAMERA_RING, metrics=None) -> Optional["CameraReader"]:
+        ring = attach_or_none(name)
+        return cls(ring, metrics=metrics) if ring is not None else None
+
+    def isOpened(self) -> bool:
+        return self._ring is not None
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self._ring is None:
+            return False, None
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            seq = self._ring.latest_seq()
+            if seq > self._last_seq:
+                got = self._ring.read(seq, mutable=True)
+                if got is not None:
+                    seq, ts, data = got
+                    h, w, channels = _SHAPE.unpack_from(data, 0)
+                    frame = np.frombuffer(data, dtype=np.uint8, offset=_SHAPE.size, count=h * w * channels)
+                    skipped = max(0, seq - self._last_seq - 1) if self._last_seq else 0
+                    self.skipped += skipped
+                    self._last_seq = seq
+                    self.last_timestamp = ts
+                    if self.metrics is not None:
+                        self.metrics.observe("capture", time.perf_counter() - start)
+                        self.metrics.count("frames_dropped", skipped)
+                    return True, frame.reshape((h, w, channels) if channels > 1 else (h, w))
+            if time.monotonic() >= deadline:
+                return False, None
+            time.sleep(self.poll)
+
+    def release(self) -> None:
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+
+class LatestFrameCapture:
+    """Grab from a VideoCapture on a dedicated thread and keep only the newest frame.
+
+    Drop-in for the VideoCapture itself: ``read()`` returns the newest frame
+    not returned before (waiting up to ``timeout`` seconds), so inference that
+    is slower than the camera always sees the freshest image. ``metrics`` is
+    used as for CameraReader.
+    """
+
+    def __init__(self, cap, timeout: float = 1.0, metrics=None):
+        self._cap = cap
+        self.metrics = metrics
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._read_seq = 0
+        self._frame_ts = 0.0
+        self.last_timestamp = 0.0
+        self.skipped = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="latest-frame-capture", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            try:
+                ok, frame = self._cap.read()
+            except Exception:
+                ok, frame = False, None
+            if not ok or frame is None:
+                time.sleep(0.01)
+                continue
+            with self._cond:
+                self._frame = frame
+                self._frame_ts = time.time()
+                self._seq += 1
+                self._cond.notify_all()
+
+    def isOpened(self) -> bool:
+        return self._running and self._cap.isOpened()
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        start = time.perf_counter()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._read_seq or not self._running, self.timeout):
+                return False, None
+            if self._seq <= self._read_seq:
+                return False, None
+            skipped = self._seq - self._read_seq - 1 if self._read_seq else 0
+            self.skipped += skipped
+            self._read_seq = self._seq
+            self.last_timestamp = self._frame_ts
+            frame = self._frame
+        if self.metrics is not None:
+            self.metrics.observe("capture", time.perf_counter() - start)
+            self.metrics.count("frames_dropped", skipped)
+        return True, frame
+
+    def release(self) -> None:
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+        self._cap.release()
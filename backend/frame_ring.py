@@ -0,0 +1,173 @@
+"""
+Shared-memory ring of encoded frame slots.
+
+The recognition workers publish their annotated preview frames (JPEG bytes)
+into a named shared-memory segment owned by the Flask server, and the server
+streams the newest one to the browser. Nothing touches the filesystem.
+
+Layout (little endian):
+
+    header : magic u32 | slots u32 | slot_size u32 | reserved u32 | latest_seq u64
+    slot   : seq_begin u64 | seq_end u64 | length u32 | reserved u32 | timestamp f64 | payload
+
+Every slot is guarded by a sequence lock: the writer stamps ``seq_begin``
+before touching the payload and ``seq_end`` once it is complete, so a reader
+can tell a torn slot (the two differ, or no longer match the sequence number
+it asked for) from a finished one. Sequence numbers start at 1; 0 means
+"nothing published yet".
+"""
+from __future__ import annotations
+
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+# Segment names shared by app.py and the worker scripts
+HAND_GESTURES_RING = "bolt_hand_gestures_frames"
+LIP_READING_RING = "bolt_lip_reading_frames"
+CAMERA_RING = "bolt_camera_frames"  # raw BGR frames from the server's capture service
+
+DEFAULT_SLOTS = 4
+DEFAULT_SLOT_SIZE = 512 * 1024  # a 640x480 JPEG is typically 40-120 KB
+
+_MAGIC = 0x424F4C54  # "BOLT"
+_HEADER = struct.Struct("<IIIIQ")
+_SLOT_HEADER = struct.Struct("<QQIId")
+_LATEST_OFFSET = 16
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without letting this process unlink it on exit.
+
+    On POSIX the resource tracker of every attaching process would otherwise
+    destroy the segment when that process exits, pulling it out from under the
+    server (fixed by ``track=False`` on Python 3.13+).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        if os.name == "posix":
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+            except Exception:
+                pass
+        return shm
+
+
+class FrameRing:
+    """Fixed number of frame slots in a shared-memory segment."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        magic, slots, slot_size, _, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"shared memory segment {shm.name!r} is not a frame ring")
+        self.name = shm.name
+        self.slots = slots
+        self.slot_size = slot_size
+        self._stride = _SLOT_HEADER.size + slot_size
+        self._next_seq = self.latest_seq() + 1
+
+    # ---- construction ---- #
+    @classmethod
+    def create(cls, name: str, slots: int = DEFAULT_SLOTS, slot_size: int = DEFAULT_SLOT_SIZE) -> "FrameRing":
+        """Create (or recreate) the segment. Called once by the server."""
+        size = _HEADER.size + slots * (_SLOT_HEADER.size + slot_size)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a server that did not shut down cleanly, or still
+            # held by the Flask reloader's parent process: reuse it if it fits
+            shm = shared_memory.SharedMemory(name=name, create=False)
+            if shm.size < size:
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, slots, slot_size, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        """Attach to a ring created by the server. Raises FileNotFoundError if it does not exist."""
+        return cls(_attach_untracked(name), owner=False)
+
+    # ---- writer side ---- #
+    def write(self, data, timestamp: Optional[float] = None, header: bytes = b"") -> int:
+        """Publish one encoded frame and return its sequence number (0 if it does not fit).
+
+        ``data`` may be bytes or any contiguous buffer, e.g. the array returned
+        by ``cv2.imencode``. ``header`` is written just before it in the same
+        slot, saving a concatenation copy for large payloads.
+        """
+        view = memoryview(data).cast("B")
+        length = len(header) + view.nbytes
+        if length > self.slot_size:
+            return 0
+        # the server may have published a placeholder since we last wrote
+        seq = max(self._next_seq, self.latest_seq() + 1)
+        self._next_seq = seq + 1
+        off = _HEADER.size + (seq % self.slots) * self._stride
+        ts = time.time() if timestamp is None else timestamp
+        struct.pack_into("<Q", self._buf, off, seq)  # seq_begin: slot is being rewritten
+        start = off + _SLOT_HEADER.size
+        if header:
+            self._buf[start:start + len(header)] = header
+        self._buf[start + len(header):start + length] = view
+        _SLOT_HEADER.pack_into(self._buf, off, seq, seq, length, 0, ts)
+        struct.pack_into("<Q", self._buf, _LATEST_OFFSET, seq)
+        return seq
+
+    # ---- reader side ---- #
+    def latest_seq(self) -> int:
+        return struct.unpack_from("<Q", self._buf, _LATEST_OFFSET)[0]
+
+    def read(self, seq: Optional[int] = None, mutable: bool = False) -> Optional[Tuple[int, float, bytes]]:
+        """Return ``(seq, timestamp, data)`` for ``seq`` (default: newest frame).
+
+        Returns None if nothing was published yet, if the slot has already been
+        recycled for a newer frame, or if the writer overwrote it mid-read.
+        The payload is copied exactly once, straight out of the slot; with
+        ``mutable`` it is a bytearray so callers can wrap it in a writable array.
+        """
+        if seq is None:
+            seq = self.latest_seq()
+        if seq <= 0:
+            return None
+        off = _HEADER.size + (seq % self.slots) * self._stride
+        seq_begin, seq_end, length, _, ts = _SLOT_HEADER.unpack_from(self._buf, off)
+        if seq_begin != seq or seq_end != seq or length > self.slot_size:
+            return None
+        start = off + _SLOT_HEADER.size
+        data = (bytearray if mutable else bytes)(self._buf[start:start + length])
+        if struct.unpack_from("<Q", self._buf, off)[0] != seq:
+            return None  # torn: the writer lapped us while copying
+        return seq, ts, data
+
+    # ---- lifetime ---- #
+    def close(self) -> None:
+        self._buf = None
+        try:
+            self._shm.close()
+        except Exception:
+            pass
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except Exception:
+                pass
+
+
+def attach_or_none(name: str) -> Optional[FrameRing]:
+    """Attach to a server-owned ring, or return None when running standalone."""
+    try:
+        return FrameRing.attach(name)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[WARN] Frame ring {name!r} not available ({e}); preview frames will not be published.")
+        return None
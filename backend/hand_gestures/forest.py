@@ -0,0 +1,163 @@
+"""
+The trained gesture RandomForest as plain NumPy arrays.
+
+sklearn's predict_proba validates its input, dispatches every tree through
+joblib and allocates per call. That costs milliseconds for a handful of 42
+feature rows. export_forest() flattens the forest's trees into one set of
+contiguous node arrays. FlatForest decides every split of every tree in one
+vectorized comparison, then walks all trees at once with one gather per tree
+level. It returns the same probabilities and labels as the sklearn model,
+in tens of microseconds for a frame's rows.
+
+Layout (all trees concatenated, child indices are global):
+    feature    int32    split feature (0 at leaves)
+    threshold  float64  go left when x[feature] <= threshold (+inf at leaves)
+    left/right int32    children; a leaf points at itself, so extra steps are no-ops
+    value      float64  (nodes, classes) class probabilities of each node
+    roots      int32    first node of every tree
+    classes             class labels, in the model's order
+
+Usage:
+    python forest.py [gesture_model.pkl] [gesture_model.npz]
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+import numpy as np
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+FLAT_MODEL_FILE = os.path.join(THIS_DIR, "gesture_model.npz")
+
+
+def flatten_forest(model) -> dict:
+    """The arrays of the layout above for a fitted RandomForestClassifier (or one decision tree)."""
+    trees = getattr(model, "estimators_", None) or [model]
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        t = tree.tree_
+        n = t.node_count
+        leaf = t.children_left == -1
+        idx = np.arange(n)
+        features.append(np.where(leaf, 0, t.feature))
+        thresholds.append(np.where(leaf, np.inf, t.threshold))
+        lefts.append(np.where(leaf, idx, t.children_left) + offset)
+        rights.append(np.where(leaf, idx, t.children_right) + offset)
+        value = t.value[:, 0, :].astype(np.float64)
+        # sklearn's DecisionTreeClassifier.predict_proba: each node's distribution, normalized
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        values.append(value / totals)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, int(t.max_depth))
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "classes": _plain_classes(model.classes_),
+        "max_depth": np.int32(max_depth),
+        "n_features": np.int32(model.n_features_in_),
+    }
+
+
+def _plain_classes(classes) -> np.ndarray:
+    """String labels as a unicode array: .npz files are loaded without pickle."""
+    classes = np.asarray(classes)
+    return classes.astype(str) if classes.dtype == object else classes
+
+
+def export_forest(model, path: str = FLAT_MODEL_FILE) -> str:
+    """Write ``model`` as a flat .npz next to the pickle; returns the path."""
+    np.savez(path, **flatten_forest(model))
+    return path
+
+
+class FlatForest:
+    """Drop-in for the fitted forest's ``predict_proba`` / ``predict`` / ``classes_``."""
+
+    def __init__(self, arrays: dict):
+        self.feature = np.ascontiguousarray(arrays["feature"], dtype=np.intp)
+        self.threshold = np.ascontiguousarray(arrays["threshold"], dtype=np.float64)
+        self.left = np.ascontiguousarray(arrays["left"], dtype=np.intp)
+        self.right = np.ascontiguousarray(arrays["right"], dtype=np.intp)
+        # left and right child interleaved: children[2 * node + went_right]
+        self.children = np.stack([self.left, self.right], axis=1).ravel()
+        self._child_base = 2 * np.arange(len(self.feature))
+        self.value = np.ascontiguousarray(arrays["value"], dtype=np.float64)
+        self.roots = np.ascontiguousarray(arrays["roots"], dtype=np.intp)
+        self.classes_ = np.asarray(arrays["classes"])
+        self.max_depth = int(arrays["max_depth"])
+        self.n_features_in_ = int(arrays["n_features"])
+        n_nodes = len(self.feature)
+        if not (len(self.threshold) == len(self.left) == len(self.right) == len(self.value) == n_nodes):
+            raise ValueError("node arrays differ in length")
+        if self.value.shape[1] != len(self.classes_):
+            raise ValueError("node values do not match the classes")
+        for name in ("left", "right", "roots"):
+            ids = getattr(self, name)
+            if len(ids) and (ids.min() < 0 or ids.max() >= n_nodes):
+                raise ValueError(f"{name} points outside the node arrays")
+        if n_nodes and self.feature.max() >= self.n_features_in_:
+            raise ValueError("split on a feature the model does not have")
+
+    @classmethod
+    def from_model(cls, model) -> "FlatForest":
+        return cls(flatten_forest(model))
+
+    @classmethod
+    def load(cls, path: str = FLAT_MODEL_FILE) -> "FlatForest":
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def apply(self, X) -> np.ndarray:
+        """(rows, trees) leaf index reached by every row in every tree."""
+        # float32 like sklearn, so every threshold comparison comes out the same
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected rows of {self.n_features_in_} features, got shape {X.shape}")
+        # decide every split of every tree at once: step[row, node] is the
+        # child that row moves to, so walking all trees is one gather per level
+        # (float32 -> float64 is exact, and saves a casting loop over every node)
+        went_right = X.astype(np.float64).take(self.feature, axis=1) > self.threshold
+        offsets = (np.arange(len(X)) * len(self.feature))[:, None]
+        step = self.children.take(self._child_base + went_right)
+        step += offsets  # positions in the flattened step, so one take() serves every row
+        step = step.ravel()
+        nodes = self.roots + offsets
+        for _ in range(self.max_depth):
+            nodes = step.take(nodes)
+        return nodes - offsets
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Mean of the trees' leaf distributions."""
+        leaves = self.apply(X)
+        proba = self.value[leaves].sum(axis=1)
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def main(argv=None) -> int:
+    import joblib
+
+    argv = sys.argv[1:] if argv is None else argv
+    src = argv[0] if argv else os.path.join(THIS_DIR, "gesture_model.pkl")
+    dst = argv[1] if len(argv) > 1 else os.path.splitext(src)[0] + ".npz"
+    model = joblib.load(src)
+    export_forest(model, dst)
+    flat = FlatForest.load(dst)
+    print(f"[INFO] Exported {len(flat.roots)} trees ({len(flat.feature)} nodes, depth {flat.max_depth}) to {dst}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
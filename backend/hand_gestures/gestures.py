@@ -0,0 +1,277 @@
+"""
+Gesture recognition pieces shared by the live worker (main.py) and the
+offline batch processor (backend/batch.py).
+
+The model takes one row per hand: the 21 landmark x pixel coordinates, then
+the 21 y coordinates, truncated to whole pixels (that is how
+gesture_data.csv was recorded). LandmarkBuffer builds those rows for every
+detected hand in preallocated arrays, and classify_hands() runs a single
+predict_proba over all of them. load_model() hands out the forest flattened
+into NumPy arrays (see forest.py), which predicts the same labels far faster.
+
+ModelWatcher picks up a retrained model while the worker keeps running: it
+notices the model files change, loads and checks the new model on its own
+thread, and only then swaps it in.
+
+For live video, GestureVoter turns the per-frame labels into a stable
+gesture by a sliding-window vote. ClassificationCache skips the classifier
+while the hands hold still.
+"""
+import os
+import threading
+from collections import deque
+
+import joblib
+import numpy as np
+
+from forest import FlatForest
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILE = os.path.join(THIS_DIR, "gesture_model.pkl")
+MAX_HANDS = 2  # MediaPipe Hands' default max_num_hands
+N_LANDMARKS = 21
+
+
+def load_model(path=MODEL_FILE):
+    """The trained gesture classifier as a FlatForest, or None if it is missing or unreadable.
+
+    An exported .npz next to the pickle is used when it is at least as new;
+    otherwise the pickle is loaded and flattened here (a few milliseconds).
+    """
+    flat_path = os.path.splitext(path)[0] + ".npz"
+    if os.path.exists(flat_path) and (not os.path.exists(path) or os.path.getmtime(flat_path) >= os.path.getmtime(path)):
+        try:
+            return FlatForest.load(flat_path)
+        except Exception as e:
+            print(f"[WARN] Failed to load flat model {flat_path}: {e}")
+    if not os.path.exists(path):
+        return None
+    try:
+        model = joblib.load(path)
+    except Exception as e:
+        print(f"[WARN] Failed to load model {path}: {e}")
+        return None
+    try:
+        return FlatForest.from_model(model)
+    except Exception as e:
+        print(f"[WARN] Could not flatten {path} ({e}); using the sklearn model as is.")
+        return model
+
+
+def validate_model(model):
+    """None if ``model`` can classify our landmark rows, else what is wrong with it."""
+    try:
+        n_features = getattr(model, "n_features_in_", 2 * N_LANDMARKS)
+        if n_features != 2 * N_LANDMARKS:
+            return f"expects {n_features} features, not {2 * N_LANDMARKS}"
+        probe = np.zeros((2, 2 * N_LANDMARKS), dtype=np.float32)
+        probe[1] = 320.0
+        probs = np.asarray(model.predict_proba(probe))
+        if probs.shape != (2, len(model.classes_)):
+            return f"predict_proba returned shape {probs.shape}"
+        if not np.all(np.isfinite(probs)) or not np.allclose(probs.sum(axis=1), 1.0):
+            return "predict_proba does not return probabilities"
+    except Exception as e:
+        return str(e)
+    return None
+
+
+class ModelWatcher(threading.Thread):
+    """Reloads the gesture model in the background whenever its files change.
+
+    ``model`` always holds a validated model (or the initial one). Readers
+    take it once per frame, so a new model lands between frames and
+    recognition never waits for a load. ``on_reload(model)`` runs on this
+    thread after each swap.
+    """
+
+    def __init__(self, model=None, path=MODEL_FILE, interval: float = 1.0, on_reload=None):
+        super().__init__(name="gesture-model-watcher", daemon=True)
+        self.model = model
+        self.path = path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.reloads = 0
+        self._stop_event = threading.Event()
+
+    def _signature(self):
+        sig = []
+        for path in (self.path, os.path.splitext(self.path)[0] + ".npz"):
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def run(self):
+        seen = self._signature()
+        while not self._stop_event.wait(self.interval):
+            sig = self._signature()
+            if sig == seen:
+                continue
+            # let the trainer finish writing: load once the files stop changing
+            if self._stop_event.wait(self.interval):
+                break
+            if self._signature() != sig:
+                continue
+            seen = sig
+            self.reload()
+
+    def reload(self) -> bool:
+        """Load, validate and swap in the model on disk; False keeps the current one."""
+        model = load_model(self.path)
+        if model is None:
+            print("[WARN] Gesture model changed but could not be loaded; keeping the current one.")
+            return False
+        problem = validate_model(model)
+        if problem:
+            print(f"[WARN] New gesture model rejected ({problem}); keeping the current one.")
+            return False
+        self.model = model  # a single reference swap; frames in flight finish on the old model
+        self.reloads += 1
+        print(f"[INFO] Reloaded gesture model ({len(model.classes_)} gestures: {', '.join(map(str, model.classes_))}).")
+        if self.on_reload is not None:
+            try:
+                self.on_reload(model)
+            except Exception as e:
+                print("[WARN] on_reload failed:", e)
+        return True
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def landmark_list(hand_landmark, w, h):
+    """[[id, x_px, y_px], ...] for the 21 landmarks of one MediaPipe hand."""
+    return [[id, int(lm.x * w), int(lm.y * h)] for id, lm in enumerate(hand_landmark.landmark)]
+
+
+def classify_gesture(lmList, model):
+    """Return (label, confidence) for one hand."""
+    row = np.array([p[1] for p in lmList] + [p[2] for p in lmList]).reshape(1, -1)
+    probs = model.predict_proba(row)[0]
+    best = int(np.argmax(probs))
+    return model.classes_[best], float(probs[best])
+
+
+class LandmarkBuffer:
+    """Preallocated (max_hands, 42) model input rows, refilled in place every frame.
+
+    The pixel math is done in float64 so it truncates exactly like
+    int(lm.x * w). The rows are float32 because that is what the forest's
+    predict_proba converts its input to, so handing them over costs no copy.
+    Whole pixel coordinates are exact in float32.
+
+    Only the coordinate reads are per landmark (protobuf gives no array
+    view); the pixel conversion runs once over all hands.
+    """
+
+    def __init__(self, max_hands: int = MAX_HANDS):
+        self.rows = np.zeros((max_hands, 2 * N_LANDMARKS), dtype=np.float32)
+        # the MediaPipe coordinates (0..1 of the frame) of the last fill, same layout
+        self.normalized = np.zeros((max_hands, 2 * N_LANDMARKS), dtype=np.float64)
+        self._raw = np.zeros((max_hands, 2 * N_LANDMARKS), dtype=np.float64)
+        self._scale = np.ones(2 * N_LANDMARKS, dtype=np.float64)
+        self._size = None
+
+    def fill(self, multi_hand_landmarks, w, h):
+        """Write the rows for up to max_hands hands; returns the filled rows (a view)."""
+        if self._size != (w, h):
+            self._scale[:N_LANDMARKS] = w
+            self._scale[N_LANDMARKS:] = h
+            self._size = (w, h)
+        raw = self._raw
+        n = min(len(multi_hand_landmarks), len(raw))
+        # MediaPipe's landmarks are protobuf messages, so reading them stays a
+        # scalar loop; writing straight into the buffer beat np.fromiter
+        # (which allocates per hand) when measured. Everything after is vectorized.
+        for i in range(n):
+            row = self.normalized[i]
+            for j, lm in enumerate(multi_hand_landmarks[i].landmark):
+                row[j] = lm.x
+                row[N_LANDMARKS + j] = lm.y
+        # normalized -> whole pixels for every hand at once, like int(lm.x * w)
+        np.multiply(self.normalized[:n], self._scale, out=raw[:n])
+        np.trunc(raw[:n], out=raw[:n])
+        np.copyto(self.rows[:n], raw[:n])
+        return self.rows[:n]
+
+
+def classify_hands(rows, model):
+    """Return [(label, confidence), ...] for each row of a LandmarkBuffer, in one predict call."""
+    if not len(rows):
+        return []
+    probs = model.predict_proba(rows)
+    return list(zip(model.classes_[probs.argmax(axis=1)], probs.max(axis=1).tolist()))
+
+
+class ClassificationCache:
+    """The last classification, reused while the hands have not moved.
+
+    A frame is a hit when it shows as many hands as the last classified one,
+    the model is the same, and no normalized landmark coordinate moved by
+    ``tolerance`` or more since that frame. Comparing against the last
+    *classified* frame means slow drift still triggers a new classification.
+    A tolerance of 0 disables the cache.
+    """
+
+    def __init__(self, tolerance: float, max_hands: int = MAX_HANDS):
+        self.tolerance = tolerance
+        self._landmarks = np.zeros((max_hands, 2 * N_LANDMARKS), dtype=np.float64)
+        self._diff = np.zeros((max_hands, 2 * N_LANDMARKS), dtype=np.float64)
+        self._count = 0
+        self._model = None
+        self._results = None
+
+    def get(self, normalized, model):
+        """The cached [(label, confidence), ...] for these landmarks, or None."""
+        n = len(normalized)
+        if self._results is None or model is not self._model or n != self._count:
+            return None
+        diff = self._diff[:n]
+        np.subtract(normalized, self._landmarks[:n], out=diff)
+        np.abs(diff, out=diff)
+        return self._results if diff.max() < self.tolerance else None
+
+    def put(self, normalized, model, results) -> None:
+        n = len(normalized)
+        np.copyto(self._landmarks[:n], normalized)
+        self._count = n
+        self._model = model
+        self._results = results
+
+
+class GestureVoter:
+    """Sliding-window majority vote over the per-frame gesture labels.
+
+    Each frame votes for its label when the classifier was at least
+    ``min_confidence`` sure, and abstains otherwise (or when no hand is seen).
+    A label is the stable gesture once it holds ``quorum`` of the last
+    ``window`` votes (default: a majority).
+    """
+
+    def __init__(self, window: int = 5, min_confidence: float = 0.5, quorum: int = None):
+        self.window = max(1, window)
+        self.min_confidence = min_confidence
+        self.quorum = quorum or self.window // 2 + 1
+        self._votes = deque(maxlen=self.window)
+
+    def update(self, label=None, confidence: float = 0.0):
+        """Add one frame's vote; returns (stable label, its mean confidence) or None."""
+        if label is not None and confidence >= self.min_confidence:
+            self._votes.append((label, confidence))
+        else:
+            self._votes.append((None, 0.0))
+        tally = {}
+        for vote, conf in self._votes:
+            if vote is not None:
+                count, total = tally.get(vote, (0, 0.0))
+                tally[vote] = (count + 1, total + conf)
+        if not tally:
+            return None
+        best, (count, total) = max(tally.items(), key=lambda item: item[1][0])
+        return (best, total / count) if count >= self.quorum else None
+
+    def reset(self) -> None:
+        self._votes.clear()
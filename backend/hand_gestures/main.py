@@ -3,31 +3,32 @@ import mediapipe as mp
 import time
 import csv
 import os
+import sys
 import shutil
-import numpy as np
 import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import controller as cnt  # optional Arduino controller; ensure safe import if not present
+from gestures import (MODEL_FILE, ClassificationCache, GestureVoter, LandmarkBuffer, ModelWatcher,
+                      classify_hands, load_model)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_ring import CAMERA_RING, HAND_GESTURES_RING, attach_or_none
+from capture import CameraReader, LatestFrameCapture
+from camera_discovery import open_camera
+from worker_ipc import WorkerLink
+from metrics import StageMetrics
+from pipeline import Pipeline
 
 # Config
 THIS_DIR = os.path.dirname(__file__)
 DATA_FILE = os.path.join(THIS_DIR, "gesture_data.csv")
-MODEL_FILE = os.path.join(THIS_DIR, "gesture_model.pkl")
-OUTPUT_FILE = os.path.join(THIS_DIR, "output.txt")
-STOP_FILE = os.path.join(THIS_DIR, "stop.txt")
-FRAME_FILE = os.path.join(THIS_DIR, "frame.jpg")
 TRAINING_MODE = False  # set True if you want to collect labelled data
-
-time.sleep(1.0)
-
-# remove stale stop file if present (prevents the script from instantly exiting when started)
-try:
-    if os.path.exists(STOP_FILE):
-        os.remove(STOP_FILE)
-        print("[INFO] Removed stale stop file at startup.")
-except Exception:
-    pass
+# A gesture is reported once it wins VOTE_WINDOW frames' majority vote, counting
+# only frames classified with at least VOTE_MIN_CONFIDENCE
+VOTE_WINDOW = int(os.environ.get("BOLT_GESTURE_WINDOW", "5"))
+VOTE_MIN_CONFIDENCE = float(os.environ.get("BOLT_GESTURE_MIN_CONFIDENCE", "0.5"))
+# The classifier is skipped while no landmark moved this much (fraction of the frame)
+MOTION_TOLERANCE = float(os.environ.get("BOLT_GESTURE_MOTION_TOLERANCE", "0.01"))
 
 # MediaPipe setup
 mp_draw = mp.solutions.drawing_utils
@@ -35,33 +36,21 @@ mp_hand = mp.solutions.hands
 
 tipIds = [4, 8, 12, 16, 20]
 
-def open_camera(device=0, retries=5, delay=0.5):
-    """Robust camera opener."""
-    target_indices = [0, 1, 2]
-    backends = [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
-    
-    for index in target_indices:
-        for attempt in range(1, retries + 1):
-            for backend in backends:
-                try:
-                    cap = cv2.VideoCapture(index, backend)
-                    if cap.isOpened():
-                        # Set resolution to 640x480
-                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                        
-                        ret, frame = cap.read()
-                        if ret and frame is not None:
-                            print(f"[INFO] Camera opened at index {index} (Backend {backend})")
-                            return cap
-                        cap.release()
-                except Exception as e:
-                    pass
-            time.sleep(delay)
-    print("[ERROR] Unable to open camera on any index.")
-    return None
+# ring names are per camera session; the server passes them in the environment
+frame_ring = attach_or_none(os.environ.get("BOLT_PREVIEW_RING", HAND_GESTURES_RING))
+link = WorkerLink.from_env("hand_gestures")
+# stage timings ride along with the link's heartbeats
+metrics = link.metrics if link is not None else StageMetrics()
+tracer = link.tracer if link is not None else None
 
-video = open_camera(0)
+def open_video():
+    """Frames from the server's capture service, or the camera itself when standalone."""
+    if link is not None:
+        reader = CameraReader.attach_or_none(os.environ.get("BOLT_CAMERA_RING", CAMERA_RING), metrics=metrics)
+        if reader is not None:
+            return reader
+    cap = open_camera(0)
+    return LatestFrameCapture(cap, metrics=metrics) if cap is not None else None
 
 def save_landmarks(label, lmList):
     file_exists = os.path.exists(DATA_FILE)
@@ -131,134 +120,201 @@ def train_model():
     print(f"[INFO] Model trained. Accuracy: {acc:.2f}")
     return True
 
-def classify_gesture(lmList, model):
-    row = np.array([p[1] for p in lmList] + [p[2] for p in lmList]).reshape(1, -1)
-    return model.predict(row)[0]
-
 model = None
 if not TRAINING_MODE and os.path.exists(MODEL_FILE):
-    try:
-        model = joblib.load(MODEL_FILE)
+    # flattened into NumPy node arrays (forest.FlatForest) for fast per-frame prediction
+    model = load_model()
+    if model is not None:
         print("[INFO] Loaded trained model for classification.")
-    except Exception as e:
-        print(f"[WARN] Failed to load model: {e}. Attempting to retrain...")
+    else:
+        print("[WARN] Attempting to retrain...")
         if train_model():
-            model = joblib.load(MODEL_FILE)
-        else:
+            model = load_model()
+        if model is None:
             print("[ERROR] Could not train model. Hand gestures will not work.")
 
-try:
-    with mp_hand.Hands(min_detection_confidence=0.5,
-                       min_tracking_confidence=0.5) as hands:
-        # track last written text to avoid noisy repeated writes
-        last_text = ""
-        while True:
-            # graceful stop if stop file exists
-            if os.path.exists(STOP_FILE):
-                print("[INFO] Stop file found - exiting hand_gestures loop.")
-                break
+# a retrained model (train_gesture.py) is loaded and swapped in without a restart
+model_watcher = ModelWatcher(model, on_reload=lambda new_model: metrics.count("model_reloads"))
+if not TRAINING_MODE:
+    model_watcher.start()
 
-            # Ensure video capture is available; try reopening if needed
-            if video is None or not getattr(video, 'isOpened', lambda: False)():
-                print("[WARN] Camera not opened, attempting to reopen...")
-                video = open_camera(0)
-                if video is None:
-                    time.sleep(0.5)
-                    continue
+def run_session(hands):
+    """Recognize gestures until the server deactivates us (or 'q' is pressed).
 
-            ret, image = video.read()
-            if not ret or image is None:
-                print("[WARN] Could not read frame from camera (ret=False). Retrying...")
-                time.sleep(0.2)
-                continue
+    The work is split into pipeline stages on their own threads, so
+    consecutive frames overlap instead of waiting for each other:
+        capture (read + RGB) -> detect (MediaPipe) -> annotate (draw,
+        classify, result) -> publish (JPEG into the preview ring)
+    This thread polls the server's commands and shows the preview window.
+
+    Returns True if the worker should exit afterwards.
+    """
+    state = {"video": open_video(), "frame_id": 0, "last_gesture": None}
+    landmarks = LandmarkBuffer()  # model input rows, reused every frame
+    cache = ClassificationCache(MOTION_TOLERANCE)
+    voter = GestureVoter(VOTE_WINDOW, VOTE_MIN_CONFIDENCE)
+    if state["video"] is None:
+        if link is not None:
+            link.state("error", "camera unavailable")
+        return link is None
+    if link is not None:
+        link.state("active")
+
+    def capture():
+        video = state["video"]
+        # Ensure video capture is available; try reopening if needed
+        if video is None or not getattr(video, 'isOpened', lambda: False)():
+            print("[WARN] Camera not opened, attempting to reopen...")
+            state["video"] = open_video()
+            if state["video"] is None:
+                time.sleep(0.5)
+            return None
+        ret, image = video.read()
+        if not ret or image is None:
+            print("[WARN] Could not read frame from camera (ret=False). Retrying...")
+            time.sleep(0.2)
+            return None
+        state["frame_id"] += 1
+        # the RGB copy also detaches the frame from the capture ring's slot
+        return {"id": state["frame_id"], "captured_at": video.last_timestamp,
+                "start": time.perf_counter(), "image": cv2.cvtColor(image, cv2.COLOR_BGR2RGB)}
+
+    def detect(frame):
+        frame["image"].flags.writeable = False
+        with metrics.time("hands_process"):
+            frame["results"] = hands.process(frame["image"])
+        return frame
 
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            results = hands.process(image)
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    def annotate(frame):
+        model = model_watcher.model  # once per frame, so a reload never splits a frame
+        image = cv2.cvtColor(frame["image"], cv2.COLOR_RGB2BGR)
+        results = frame["results"]
 
-            lmList = []
+        if results.multi_hand_landmarks:
+            # Draw landmarks for all detected hands
+            for hand_landmark in results.multi_hand_landmarks:
+                mp_draw.draw_landmarks(image, hand_landmark, mp_hand.HAND_CONNECTIONS)
+
+        if TRAINING_MODE:
+            # headless mode: keyboard-based landmark saving not available
+            # If you need to collect labeled data, use a separate collection script
+            pass
+        elif model is not None:
+            vote = None
             if results.multi_hand_landmarks:
-                # Draw landmarks for all detected hands
-                for hand_landmark in results.multi_hand_landmarks:
-                    mp_draw.draw_landmarks(image, hand_landmark, mp_hand.HAND_CONNECTIONS)
-                first_hand = results.multi_hand_landmarks[0]
                 h, w, c = image.shape
-                for id, lm in enumerate(first_hand.landmark):
-                    cx, cy = int(lm.x * w), int(lm.y * h)
-                    lmList.append([id, cx, cy])
+                rows = landmarks.fill(results.multi_hand_landmarks, w, h)
+                normalized = landmarks.normalized[:len(rows)]
+                hands_found = cache.get(normalized, model)
+                if hands_found is None:
+                    # every detected hand in one predict call
+                    with metrics.time("classify_gesture"):
+                        hands_found = classify_hands(rows, model)
+                    cache.put(normalized, model, hands_found)
+                    metrics.count("classify_cache_misses")
+                else:
+                    metrics.count("classify_cache_hits")
+                # the most confident hand is this frame's vote
+                vote = max(hands_found, key=lambda hand: hand[1])
+            stable = voter.update(*vote) if vote is not None else voter.update()
 
-            if len(lmList) != 0:
-                if TRAINING_MODE:
-                    # headless mode: keyboard-based landmark saving not available
-                    # If you need to collect labeled data, use a separate collection script
+            if stable is not None:
+                gesture, confidence = stable
+                # send a result event only when the voted gesture changes
+                if gesture != state["last_gesture"]:
+                    print(f"Recognized Gesture: {gesture} ({confidence:.2f})")
+                    if link is not None:
+                        link.result("hand-gesture", gesture, confidence,
+                                    timestamp=frame["captured_at"], frame_id=frame["id"])
+                    state["last_gesture"] = gesture
+                    # optional hardware control (ignored on errors), only on a change
+                    try:
+                        if gesture == "L": cnt.led(1)
+                        elif gesture == "ThumbsUp": cnt.led(5)
+                        elif gesture == "Peace": cnt.led(2)
+                    except Exception:
+                        pass
+                # draw text onto image buffer (useful for saved frames)
+                try:
+                    cv2.putText(image, f"Gesture: {gesture}", (20, 50),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
+                except Exception:
                     pass
-                else:
-                    if model is not None:
-                        gesture = classify_gesture(lmList, model)
-                        # prepare new text and write only when it changes
-                        try:
-                            new_text = f"Recognized Gesture: {gesture}"
-                            if new_text != last_text:
-                                try:
-                                    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-                                        f.write(new_text)
-                                        f.flush()
-                                        try:
-                                            os.fsync(f.fileno())
-                                        except Exception:
-                                            pass
-                                except Exception as e:
-                                    print("[WARN] Error writing output:", e)
-                                last_text = new_text
-                        except Exception as e:
-                            print("[WARN] Gesture classification write error:", e)
-                        # draw text onto image buffer (useful for saved frames)
-                        try:
-                            cv2.putText(image, f"Gesture: {gesture}", (20, 50),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
-                        except Exception:
-                            pass
-                        # optional hardware control (ignored on errors)
-                        try:
-                            if gesture == "L": cnt.led(1)
-                            elif gesture == "ThumbsUp": cnt.led(5)
-                            elif gesture == "Peace": cnt.led(2)
-                        except Exception:
-                            pass
+        frame["image"] = image
+        return frame
 
+    def publish(frame):
+        # publish a JPEG frame for the frontend to stream
+        if frame_ring is not None:
+            try:
+                with metrics.time("jpeg_encode"):
+                    ok, buf = cv2.imencode('.jpg', frame["image"], [cv2.IMWRITE_JPEG_QUALITY, 85])
+                if ok:
+                    frame_ring.write(buf)
+            except Exception as e:
+                print("[WARN] Failed to publish frame:", e)
+        if link is not None:
+            link.tick()
+        if tracer is not None:
+            tracer.complete("frame", frame["start"], time.perf_counter(), cat="frame", frame_id=frame["id"])
+        return frame["image"]
+
+    pipeline = Pipeline("hand_gestures", ("capture", capture),
+                        [("detect", detect), ("annotate", annotate), ("publish", publish)],
+                        metrics=metrics)
+    pipeline.start()
+    try:
+        while True:
+            # graceful stop when the server asks for it
+            if link is not None:
+                cmd = link.command()
+                if cmd in ("deactivate", "shutdown"):
+                    print(f"[INFO] Received {cmd} - ending hand_gestures session.")
+                    return cmd == "shutdown"
+
+            image = pipeline.output.get(timeout=0.05)
+            if image is None:
+                continue
             # Display the camera feed with hand landmarks and gesture text
             cv2.imshow('Hand Gesture Recognition - Press Q to Quit', image)
-            
+
             # Check for 'q' key to quit
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 print("[INFO] User pressed 'q' - exiting.")
-                break
+                return link is None
+    finally:
+        pipeline.stop()
+        try: state["video"].release()
+        except Exception: pass
+        try: cv2.destroyAllWindows()
+        except Exception: pass
+        if link is not None:
+            link.state("idle")
 
-            # write a JPEG frame for the frontend to stream (atomic write)
-            try:
-                tmp = FRAME_FILE + ".tmp"
-                # prefer Pillow for robust JPEG writing; fallback to OpenCV
-                try:
-                    from PIL import Image
-                    im = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-                    im.save(tmp, format='JPEG', quality=85)
-                except Exception:
-                    # fallback to cv2.imwrite
-                    cv2.imwrite(tmp, image)
-                try:
-                    os.replace(tmp, FRAME_FILE)
-                except Exception:
-                    os.rename(tmp, FRAME_FILE)
-            except Exception as e:
-                print("[WARN] Failed to write frame:", e)
 
+try:
+    # MediaPipe graph is built once and reused by every session
+    with mp_hand.Hands(min_detection_confidence=0.5,
+                       min_tracking_confidence=0.5) as hands:
+        if link is None:
+            # standalone: just run one session
+            run_session(hands)
+        else:
+            # ready handshake: model and MediaPipe graph are loaded
+            link.state("idle")
+            print("[INFO] Hand gestures worker warm; waiting for activation.")
+            while True:
+                cmd = link.command(None)
+                if cmd == "shutdown":
+                    break
+                if cmd == "activate" and run_session(hands):
+                    break
 finally:
-    try: video.release()
-    except Exception: pass
-    try: cv2.destroyAllWindows()
-    except Exception: pass
+    model_watcher.stop()
     try: cnt.cleanup()
     except Exception: pass
-    print("[INFO] Hand gestures script exiting.")
\ No newline at end of file
+    if frame_ring is not None:
+        frame_ring.close()
+    if link is not None:
+        link.close()
+    print("[INFO] Hand gestures script exiting.")
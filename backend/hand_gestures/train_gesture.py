@@ -22,6 +22,7 @@ import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split, cross_val_score
 from collections import Counter
+from forest import export_forest
 
 # Config
 THIS_DIR = os.path.dirname(__file__)
@@ -187,6 +188,8 @@ def train_model():
     # Save model
     print(f"\n[STEP 8] Saving model to: {MODEL_FILE}")
     joblib.dump(model, MODEL_FILE)
+    # the same forest as NumPy node arrays, which the gesture worker predicts with
+    export_forest(model, os.path.splitext(MODEL_FILE)[0] + ".npz")
     print("[SUCCESS] Model saved!\n")
     
     # Show gesture classes
@@ -0,0 +1,236 @@
+"""
+Recognition history: every gesture / lip-read word the workers produce.
+
+Each result published on the ResultBus is recorded as
+
+    {"id": int, "ts": float, "mode": "hand-gesture" | "lip-reading",
+     "text": str, "confidence": float | None, "session": str,
+     "latency_ms": float | None}
+
+The newest records sit in a bounded in-memory ring, so the common "what
+happened recently" read never touches the disk. A background writer appends
+records to a SQLite file in batches (one transaction per batch, at most
+FLUSH_INTERVAL seconds behind) with indexes on time and (session, id).
+Records stay in memory until their batch is committed, even once they have
+left the ring, so a page never skips rows that are still on their way to disk.
+
+Pages are keyed by id, newest first: ``page(before=<next_cursor>)`` is an
+indexed range scan however long the history gets, never an OFFSET.
+A session is one start_* call of a mode (see begin_session()).
+"""
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+FLUSH_INTERVAL = 2.0  # seconds a record may wait before it is written
+BATCH_SIZE = 200      # records per INSERT transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    mode TEXT NOT NULL,
+    text TEXT NOT NULL,
+    confidence REAL,
+    session TEXT,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS results_ts ON results (ts);
+CREATE INDEX IF NOT EXISTS results_session ON results (session, id);
+"""
+_COLUMNS = ("id", "ts", "mode", "text", "confidence", "session", "latency_ms")
+
+
+class HistoryStore:
+    def __init__(self, path: str, maxlen: int = 2000):
+        self.path = path
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=maxlen)
+        self._unwritten = deque()  # recorded but not committed yet, oldest first
+        self._pending = queue.Queue()
+        self._sessions = {}  # (source, mode) -> current session id
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            self._next_id = (conn.execute("SELECT MAX(id) FROM results").fetchone()[0] or 0) + 1
+        finally:
+            conn.close()
+        self._writer = threading.Thread(target=self._write_batches, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ---- recording ---- #
+    def begin_session(self, mode: str, source: str = "") -> str:
+        """Start a new session for ``mode`` on camera session ``source``; its later results belong to it."""
+        now = time.time()
+        session = f"{mode}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+        if source:
+            session = f"{source}:{session}"
+        with self._lock:
+            self._sessions[(source, mode)] = session
+        return session
+
+    def record(self, event: dict, source: str = "") -> dict:
+        """Store one ResultBus event from camera session ``source``."""
+        with self._lock:
+            row = {
+                "id": self._next_id,
+                "ts": event.get("timestamp") or time.time(),
+                "mode": event["type"],
+                "text": event["text"],
+                "confidence": event.get("confidence"),
+                "session": self._sessions.get((source, event["type"])),
+                "latency_ms": event.get("latency_ms"),
+            }
+            self._next_id += 1
+            self._recent.append(row)
+            self._unwritten.append(row)
+            self._pending.put(row)  # under the lock, so batches commit in id order
+        return row
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until everything recorded so far is on disk."""
+        done = threading.Event()
+        self._pending.put(done)
+        done.wait(timeout)
+
+    # ---- reading ---- #
+    def page(self, before: Optional[int] = None, limit: int = 50, mode: Optional[str] = None,
+             session: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> dict:
+        """Up to ``limit`` records older than id ``before``, newest first.
+
+        Served from the in-memory ring while it reaches back far enough, then
+        from SQLite. ``next_cursor`` is the ``before`` for the following page
+        (None once the history is exhausted).
+        """
+        def wanted(row):
+            return ((mode is None or row["mode"] == mode)
+                    and (session is None or row["session"] == session)
+                    and (since is None or row["ts"] >= since)
+                    and (until is None or row["ts"] < until))
+
+        with self._lock:
+            recent = list(self._recent)
+            if recent:
+                # rows that left the ring before their batch was written
+                recent[:0] = [row for row in self._unwritten if row["id"] < recent[0]["id"]]
+        items: List[dict] = []
+        for row in reversed(recent):
+            if before is not None and row["id"] >= before:
+                continue
+            if wanted(row):
+                items.append(dict(row))
+                if len(items) > limit:
+                    break
+        # rows older than the ring only exist on disk
+        if len(items) <= limit and recent and recent[0]["id"] > 1:
+            floor = recent[0]["id"] if before is None else min(before, recent[0]["id"])
+            items.extend(self._query(floor, limit + 1 - len(items), mode, session, since, until))
+        elif not recent:
+            items = self._query(before, limit + 1, mode, session, since, until)
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {"items": items, "next_cursor": items[-1]["id"] if has_more else None}
+
+    def sessions(self, limit: int = 50) -> List[dict]:
+        """Most recent sessions with their mode, time span and result count."""
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT session, mode, MIN(ts), MAX(ts), COUNT(*) FROM results "
+                "WHERE session IS NOT NULL GROUP BY session ORDER BY MAX(id) DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [{"session": s, "mode": m, "started": a, "last": b, "count": n} for s, m, a, b, n in rows]
+
+    def _query(self, before, limit, mode, session, since, until) -> List[dict]:
+        clauses, params = [], []
+        for sql, value in (("id < ?", before), ("mode = ?", mode), ("session = ?", session),
+                           ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                clauses.append(sql)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM results {where}"
+                                "ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        except sqlite3.Error as e:
+            print(f"[WARN] History query failed: {e}")
+            return []
+        finally:
+            conn.close()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    # ---- disk ---- #
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")  # readers never wait for the writer
+        return conn
+
+    def _write_batches(self):
+        conn = self._connect()
+        conn.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            batch, waiters = [], []
+            item = self._pending.get()
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break  # flush() asked for everything so far
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT OR REPLACE INTO results ({', '.join(_COLUMNS)}) "
+                            f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                            [tuple(row[c] for c in _COLUMNS) for row in batch],
+                        )
+                except sqlite3.Error as e:
+                    print(f"[ERROR] Could not write {len(batch)} history records: {e}")
+                last_id = batch[-1]["id"]
+                with self._lock:
+                    while self._unwritten and self._unwritten[0]["id"] <= last_id:
+                        self._unwritten.popleft()
+            for done in waiters:
+                done.set()
+
+
+if __name__ == "__main__":
+    # paging check: rows that fell out of the ring before being written are still paged
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.db"), maxlen=5)
+        for i in range(12):
+            store.record({"type": "hand-gesture", "text": f"g{i}"})
+        ids, cursor = [], None
+        while True:
+            result = store.page(before=cursor, limit=4)
+            ids += [row["id"] for row in result["items"]]
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+        assert ids == list(range(12, 0, -1)), ids
+        assert [row["id"] for row in store.page(before=9, limit=4)["items"]] == [8, 7, 6, 5]
+        store.flush()
+        assert [row["id"] for row in store.page(before=9, limit=4)["items"]] == [8, 7, 6, 5]
+        print("[INFO] History paging OK")
@@ -0,0 +1,200 @@
+"""
+Structured, bounded log buffer for the server and its workers.
+
+Every line printed by the server or by a worker becomes a record
+
+    {"seq": int, "ts": float, "level": "DEBUG" | "INFO" | "WARN" | "ERROR",
+     "component": "server" | "hand_gestures" | "lip_reading", "message": str}
+
+kept in an in-memory ring (the newest LogRing.maxlen records) that
+/debug_logs serves with level/component filters and a ``since`` cursor.
+The level is read off the "[INFO]" / "[WARN]" / "[ERROR]" prefixes the code
+base already uses.
+
+Records are also appended to logs/<component>.log, rotated by size, by a
+background writer thread, so neither request handlers nor the capture loops
+ever wait on the disk.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+
+_PREFIX = re.compile(r"^\s*\[(DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL)\]\s*")
+
+
+def parse_level(line: str, default: str = "INFO"):
+    """Split a printed line into (level, message) using the repo's [LEVEL] prefixes."""
+    m = _PREFIX.match(line)
+    if m:
+        level = m.group(1)
+        level = {"WARNING": "WARN", "CRITICAL": "ERROR"}.get(level, level)
+        return level, line[m.end():]
+    stripped = line.lstrip()
+    if stripped.startswith(("CRITICAL", "Traceback", "❌")):
+        return "ERROR", line
+    if stripped.startswith("⚠️"):
+        return "WARN", line
+    return default, line
+
+
+class LogRing:
+    def __init__(self, maxlen: int = 5000, log_dir: Optional[str] = None,
+                 max_bytes: int = 1024 * 1024, backups: int = 3):
+        self.maxlen = maxlen
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._log_dir = log_dir
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._files = {}  # component -> logging.Logger writing logs/<component>.log
+        self._pending = queue.Queue(maxsize=10000)
+        if log_dir:
+            threading.Thread(target=self._write_files, name="log-writer", daemon=True).start()
+
+    # ---- recording ---- #
+    def log(self, level: str, component: str, message: str) -> dict:
+        with self._lock:
+            self._seq += 1
+            record = {"seq": self._seq, "ts": time.time(), "level": level,
+                      "component": component, "message": message.rstrip()}
+            self._records.append(record)
+        if self._log_dir:
+            try:
+                self._pending.put_nowait(record)
+            except queue.Full:
+                pass  # disk is behind; the ring still has the record
+        return record
+
+    def log_line(self, component: str, line: str, default: str = "INFO") -> None:
+        if line.strip():
+            level, message = parse_level(line, default)
+            self.log(level, component, message)
+
+    def follow(self, stream, component: str) -> threading.Thread:
+        """Turn every line a worker writes to ``stream`` (its stdout pipe) into a record."""
+        def pump():
+            try:
+                for line in stream:
+                    self.log_line(component, line)
+            except (OSError, ValueError):
+                pass
+            finally:
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+        thread = threading.Thread(target=pump, name=f"log-follow-{component}", daemon=True)
+        thread.start()
+        return thread
+
+    def capture_std_streams(self, component: str = "server") -> None:
+        """Mirror this process's stdout/stderr lines into the ring (they still reach the console)."""
+        if not isinstance(sys.stdout, _TeeStream):
+            sys.stdout = _TeeStream(sys.stdout, self, component)
+        if not isinstance(sys.stderr, _TeeStream):
+            sys.stderr = _TeeStream(sys.stderr, self, component)
+
+    # ---- reading ---- #
+    def query(self, since: int = 0, level: Optional[str] = None, component: Optional[str] = None,
+              limit: int = 200) -> dict:
+        """Records newer than ``since`` (oldest first), at least ``level``, optionally for one component.
+
+        ``next`` is the cursor for the following call. ``truncated`` is true
+        when records newer than ``since`` had already rotated out of the ring.
+        """
+        min_level = LEVELS.get((level or "DEBUG").upper(), 10)
+        with self._lock:
+            records = list(self._records)
+            latest = self._seq
+        truncated = bool(records) and records[0]["seq"] > since + 1
+        out = []
+        last_seen = since
+        for record in records:
+            if record["seq"] <= since:
+                continue
+            if len(out) >= limit:
+                break
+            last_seen = record["seq"]
+            if LEVELS[record["level"]] < min_level:
+                continue
+            if component and record["component"] != component:
+                continue
+            out.append(record)
+        if len(out) < limit:
+            last_seen = max(last_seen, latest)
+        return {"records": out, "next": last_seen, "truncated": truncated}
+
+    # ---- disk ---- #
+    def _write_files(self):
+        while True:
+            record = self._pending.get()
+            try:
+                self._file_logger(record["component"]).log(
+                    LEVELS[record["level"]], "%s", record["message"],
+                    extra={"record_ts": record["ts"]},
+                )
+            except Exception:
+                pass
+
+    def _file_logger(self, component: str) -> logging.Logger:
+        logger = self._files.get(component)
+        if logger is None:
+            os.makedirs(self._log_dir, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(self._log_dir, f"{component}.log"),
+                                          maxBytes=self._max_bytes, backupCount=self._backups,
+                                          encoding="utf-8", delay=True)
+            handler.setFormatter(_RecordFormatter("%(asctime)s %(levelname)s %(message)s"))
+            logger = logging.getLogger(f"bolt.logs.{component}")
+            logger.propagate = False
+            logger.setLevel(logging.DEBUG)
+            logger.handlers = [handler]
+            self._files[component] = logger
+        return logger
+
+
+class _RecordFormatter(logging.Formatter):
+    """Stamp file lines with the time the record was made, not when it reached the disk."""
+
+    def format(self, record):
+        record.created = getattr(record, "record_ts", record.created)
+        return super().format(record)
+
+
+class _TeeStream:
+    """Writes through to the real stream and logs each complete line."""
+
+    def __init__(self, stream, ring: LogRing, component: str):
+        self._stream = stream
+        self._ring = ring
+        self._component = component
+        self._buf = ""
+        self._lock = threading.Lock()
+
+    def write(self, s):
+        n = self._stream.write(s)
+        with self._lock:
+            self._buf += s
+            if "\n" not in self._buf:
+                return n
+            *lines, self._buf = self._buf.split("\n")
+        for line in lines:
+            self._ring.log_line(self._component, line)
+        return n
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
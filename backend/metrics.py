@@ -0,0 +1,236 @@
+"""
+Throughput counters and per-stage latency histograms.
+
+Every process records into a StageMetrics: observing a stage is a bisect
+into fixed buckets plus two additions, so it can sit inside the per-frame
+loops. The workers never talk to the server per frame; their WorkerLink
+drains the accumulated deltas into the heartbeat it already sends every
+second. The server merges those deltas, together with its own stages
+(camera read, JPEG encode, stream send), into a MetricsRegistry that the
+/metrics endpoint serves.
+
+Gauges (e.g. a queue's depth) keep the last value set; only changed gauges
+travel with the heartbeat.
+
+Histogram buckets are upper bounds in milliseconds; percentiles are read
+off the bucket boundaries, which is plenty for spotting a stage that moved.
+
+Both recorders take an optional tracing.Tracer; while it is enabled every
+observed stage is also recorded as a trace span.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Optional
+
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+RATE_WINDOW = 10  # seconds over which per-second rates are averaged
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # last bucket is +inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe_ms(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def merge(self, counts, sum_ms: float, max_ms: float) -> None:
+        for i, n in enumerate(counts[:len(self.counts)]):
+            self.counts[i] += n
+        self.count += sum(counts)
+        self.sum_ms += sum_ms
+        self.max_ms = max(self.max_ms, max_ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        buckets = {f"le_{b:g}": n for b, n in zip(BUCKETS_MS, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class RateCounter:
+    """Running total plus a per-second rate over the last RATE_WINDOW seconds."""
+
+    __slots__ = ("total", "_seconds")
+
+    def __init__(self):
+        self.total = 0
+        self._seconds = deque()  # [second, count] pairs, oldest first
+
+    def add(self, n: int, now: float) -> None:
+        self.total += n
+        second = int(now)
+        if self._seconds and self._seconds[-1][0] == second:
+            self._seconds[-1][1] += n
+        else:
+            self._seconds.append([second, n])
+        while self._seconds and self._seconds[0][0] <= second - RATE_WINDOW:
+            self._seconds.popleft()
+
+    def rate(self, now: float) -> float:
+        # only whole seconds inside the window count, the current one is still filling
+        current = int(now)
+        n = sum(c for s, c in self._seconds if current - RATE_WINDOW <= s < current)
+        return round(n / RATE_WINDOW, 2)
+
+
+# --------------------- #
+# Recording side
+# --------------------- #
+class _StageTimer:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: "StageMetrics", stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self._metrics.observe(self._stage, end - self._start, end)
+        return False
+
+
+class StageMetrics:
+    """Per-process recorder; ``drain()`` hands the deltas since the last drain to the server."""
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float, end: Optional[float] = None) -> None:
+        """Record one ``stage`` duration; ``end`` is its ``perf_counter()`` end time (default: now)."""
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe_ms(seconds * 1000.0)
+        if self.tracer is not None and self.tracer.enabled:
+            end = time.perf_counter() if end is None else end
+            self.tracer.complete(stage, end - seconds, end)
+
+    def time(self, stage: str) -> _StageTimer:
+        """``with metrics.time("hands_process"): ...``"""
+        return _StageTimer(self, stage)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if n:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def drain(self) -> Optional[dict]:
+        with self._lock:
+            if not self._stages and not self._counters and not self._gauges:
+                return None
+            stages, self._stages = self._stages, {}
+            counters, self._counters = self._counters, {}
+            gauges, self._gauges = self._gauges, {}
+        return {
+            "stages": {name: [h.counts, h.sum_ms, h.max_ms] for name, h in stages.items()},
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+
+# --------------------- #
+# Server side
+# --------------------- #
+class MetricsRegistry:
+    """Everything the /metrics endpoint reports, grouped by component."""
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._stages: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, RateCounter] = {}
+        self._gauges: Dict[tuple, float] = {}
+
+    def observe(self, component: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._hist(component, stage).observe_ms(seconds * 1000.0)
+        if self.tracer is not None and self.tracer.enabled:
+            end = time.perf_counter()
+            self.tracer.complete(f"{component}.{stage}", end - seconds, end, cat=component)
+
+    def count(self, component: str, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counter(component, name).add(n, time.time())
+
+    def merge(self, component: str, payload: dict) -> None:
+        """Fold a worker's drained StageMetrics into the registry."""
+        now = time.time()
+        with self._lock:
+            for stage, (counts, sum_ms, max_ms) in payload.get("stages", {}).items():
+                self._hist(component, stage).merge(counts, sum_ms, max_ms)
+            for name, n in payload.get("counters", {}).items():
+                self._counter(component, name).add(n, now)
+            for name, value in payload.get("gauges", {}).items():
+                self._gauges[(component, name)] = value
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        components: Dict[str, dict] = {}
+        with self._lock:
+            for (component, name), counter in self._counters.items():
+                entry = components.setdefault(component, {"counters": {}, "stages": {}})
+                entry["counters"][name] = {"total": counter.total, "per_sec": counter.rate(now)}
+            for (component, stage), hist in self._stages.items():
+                entry = components.setdefault(component, {"counters": {}, "stages": {}})
+                entry["stages"][stage] = hist.to_dict()
+            for (component, name), value in self._gauges.items():
+                entry = components.setdefault(component, {"counters": {}, "stages": {}})
+                entry.setdefault("gauges", {})[name] = value
+        return {"uptime_s": round(now - self._started, 1), "rate_window_s": RATE_WINDOW, "components": components}
+
+    def _hist(self, component: str, stage: str) -> Histogram:
+        hist = self._stages.get((component, stage))
+        if hist is None:
+            hist = self._stages[(component, stage)] = Histogram()
+        return hist
+
+    def _counter(self, component: str, name: str) -> RateCounter:
+        counter = self._counters.get((component, name))
+        if counter is None:
+            counter = self._counters[(component, name)] = RateCounter()
+        return counter
@@ -0,0 +1,134 @@
+"""
+Staged frame pipelines for the recognition workers.
+
+Each stage runs on its own thread and hands its output to the next stage
+through a small bounded queue. When a stage falls behind, the oldest waiting
+frame is dropped rather than blocking the stage before it (latest-frame-wins,
+like everywhere else in the backend). Capture, inference and encoding of
+consecutive frames therefore overlap on separate cores. OpenCV and MediaPipe
+release the GIL while they work, so the threads really do run in parallel.
+
+    source ──q──▶ stage ──q──▶ stage ──q──▶ ... ──▶ output (read by the caller)
+
+With a StageMetrics every stage reports "stage_<name>_frames" (throughput),
+"stage_<name>_errors", and for its input queue "queue_<name>_dropped" plus a
+"queue_<name>_depth" gauge.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+QUEUE_SIZE = 1  # frames waiting per stage; more would only add latency
+
+
+class DropOldestQueue:
+    """Bounded FIFO whose put() never blocks: a full queue forgets its oldest item."""
+
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        self._items = deque(maxlen=max(1, maxsize))
+        self._cond = threading.Condition()
+
+    def put(self, item) -> bool:
+        """Append ``item``; True if an older item had to be dropped for it."""
+        with self._cond:
+            dropped = len(self._items) == self._items.maxlen
+            self._items.append(item)
+            self._cond.notify()
+        return dropped
+
+    def get(self, timeout: Optional[float] = None):
+        """Oldest item, or None if nothing arrived within ``timeout`` seconds."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def clear(self) -> None:
+        with self._cond:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class Pipeline:
+    """A source and a chain of stages, one thread each.
+
+    ``source()`` produces the next item (or None if it had nothing); each
+    stage's ``fn(item)`` returns the item for the next stage, or None to
+    drop it. What the last stage returns lands in ``output``.
+    """
+
+    def __init__(self, name: str, source: Tuple[str, Callable[[], Any]],
+                 stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+                 metrics=None, maxsize: int = QUEUE_SIZE, output_size: int = 1):
+        self.name = name
+        self.metrics = metrics
+        self._source = source
+        self._stages = list(stages)
+        self._queues = {stage: DropOldestQueue(maxsize) for stage, _ in self._stages}
+        self.output = DropOldestQueue(output_size)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self._stop.clear()
+        names = [name for name, _ in self._stages]
+        source_name, source_fn = self._source
+        self._threads = [threading.Thread(target=self._run_source, args=(source_name, source_fn, names[0] if names else None),
+                                          name=f"{self.name}-{source_name}", daemon=True)]
+        for i, (stage, fn) in enumerate(self._stages):
+            nxt = names[i + 1] if i + 1 < len(names) else None
+            self._threads.append(threading.Thread(target=self._run_stage, args=(stage, fn, nxt),
+                                                  name=f"{self.name}-{stage}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop every stage; a stage busy with a frame finishes that frame first."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        for q in self._queues.values():
+            q.clear()
+        self.output.clear()
+
+    def depths(self) -> dict:
+        """Frames currently waiting in front of each stage."""
+        return {stage: len(q) for stage, q in self._queues.items()}
+
+    # ---- threads ---- #
+    def _run_source(self, name: str, fn: Callable, nxt: Optional[str]) -> None:
+        while not self._stop.is_set():
+            self._step(name, fn, (), nxt)
+
+    def _run_stage(self, name: str, fn: Callable, nxt: Optional[str]) -> None:
+        inbox = self._queues[name]
+        while not self._stop.is_set():
+            item = inbox.get(timeout=0.1)
+            if item is not None:
+                self._step(name, fn, (item,), nxt)
+
+    def _step(self, name: str, fn: Callable, args: tuple, nxt: Optional[str]) -> None:
+        try:
+            out = fn(*args)
+        except Exception as e:
+            print(f"[WARN] {self.name} stage {name} failed: {e}")
+            self._count(f"stage_{name}_errors")
+            return
+        if args or out is not None:
+            self._count(f"stage_{name}_frames")  # a source that returned nothing made no frame
+        if out is None:
+            return
+        outbox = self._queues[nxt] if nxt is not None else self.output
+        if outbox.put(out) and nxt is not None:
+            self._count(f"queue_{nxt}_dropped")
+        if nxt is not None and self.metrics is not None:
+            self.metrics.gauge(f"queue_{nxt}_depth", len(outbox))
+
+    def _count(self, name: str) -> None:
+        if self.metrics is not None:
+            self.metrics.count(name)
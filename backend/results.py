@@ -0,0 +1,101 @@
+"""
+Push channel for recognition results.
+
+A ResultBus keeps a short, sequence-numbered log of recognition events
+(gestures and lip-read words) and wakes every subscriber when a new one is
+published. Unlike the video FrameHub, subscribers must see every event, so
+each one tracks the last sequence number it delivered and drains everything
+newer from the log.
+
+Workers feed the bus over their IPC link (see workers.WorkerPool); nothing
+is read from disk.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+
+def sse_message(event: dict) -> bytes:
+    """Format one result as a Server-Sent Events message."""
+    return f"id: {event['seq']}\nevent: result\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+
+
+SSE_KEEPALIVE = b": keepalive\n\n"
+
+
+class ResultBus:
+    """Bounded, sequence-numbered event log with blocking and async readers."""
+
+    def __init__(self, maxlen: int = 256):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=maxlen)
+        self._seq = 0
+        self._latest: Optional[dict] = None
+        self._async_waiters = []  # (loop, future) pairs from wait_for_async
+
+    def publish(self, type_: str, text: str, **extra) -> dict:
+        with self._cond:
+            self._seq += 1
+            event = {"seq": self._seq, "type": type_, "text": text, "timestamp": time.time()}
+            event.update(extra)
+            self._events.append(event)
+            self._latest = event
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass  # event loop already closed
+        return event
+
+    def latest(self) -> Optional[dict]:
+        """Newest result since the last reset(), or None."""
+        return self._latest
+
+    def reset(self) -> None:
+        """Forget the current result (a new recognition session is starting)."""
+        with self._cond:
+            self._latest = None
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def since(self, after_seq: int) -> List[dict]:
+        with self._cond:
+            return [e for e in self._events if e["seq"] > after_seq]
+
+    def wait_for(self, after_seq: int, timeout: Optional[float] = None) -> List[dict]:
+        """Block until events newer than ``after_seq`` exist; returns them (empty on timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            return [e for e in self._events if e["seq"] > after_seq]
+
+    async def wait_for_async(self, after_seq: int, timeout: Optional[float] = None) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        waiter = (loop, fut)
+        with self._cond:
+            if self._seq > after_seq:
+                return [e for e in self._events if e["seq"] > after_seq]
+            self._async_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+        return self.since(after_seq)
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
@@ -0,0 +1,257 @@
+"""
+Camera sessions: one capture -> recognition -> results pipeline per camera.
+
+A CameraSession owns what used to be module globals in app.py: the capture
+service for its camera, the shared-memory rings between it and its workers,
+the preview hubs, a ResultBus and a WorkerPool with its own warm
+hand-gesture and lip-reading worker processes. Sessions share only the
+server-wide metrics registry, tracer and history store, so one server can
+feed several cameras (kiosks) at once.
+
+Models are NOT shared between sessions: every session's workers load their
+own copy (the TensorFlow lip model with its runtime, the dlib face predictor,
+the MediaPipe hands graph). Each extra camera therefore costs a full set of
+models in memory, typically several hundred MB, plus their load time when
+the session is created. Scheduling the workers across CPU cores is left to
+the OS.
+
+The "default" session is camera 0 (the first camera found). It keeps the
+original ring names and backs the original routes. More sessions are
+created with POST /sessions.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from typing import Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+from camera_discovery import open_camera_index
+from capture import CAPTURE_SLOT_SIZE, CaptureService
+from frame_ring import CAMERA_RING, HAND_GESTURES_RING, LIP_READING_RING, FrameRing
+from results import ResultBus
+from streaming import FrameHub, RingWatcher
+from workers import RESULT_WORKERS, WorkerPool
+
+DEFAULT_SESSION = "default"
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,24}$")  # ends up in shared-memory names
+
+MODES = {name: type_ for type_, name in RESULT_WORKERS.items()}  # worker name -> result type
+
+# Both workers at once on the same captured frames; each runs at its own
+# rate and their results are interleaved on the session's ResultBus
+COMBINED = "combined"
+
+
+def write_placeholder_frame(ring):
+    """Publish a small 'Starting...' frame so the frontend has something to display immediately."""
+    try:
+        placeholder = np.zeros((240, 320, 3), dtype=np.uint8)
+        try:
+            cv2.putText(placeholder, 'Starting...', (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        except Exception:
+            pass
+        ok, buf = cv2.imencode('.jpg', placeholder, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if ok:
+            ring.write(buf)
+    except Exception as e:
+        print('[WARN] Could not write placeholder frame:', e)
+
+
+class CameraSession:
+    def __init__(self, session_id: str, device: int, spawners: Dict[str, Callable],
+                 metrics=None, tracer=None, history=None):
+        self.id = session_id
+        self.device = device
+        # camera indices held by the other sessions; set by SessionRegistry
+        self.other_cameras: Callable[[], set] = set
+        self.history = history
+        self.label = "" if session_id == DEFAULT_SESSION else session_id
+        suffix = f"_{self.label}" if self.label else ""
+        self.ring_names = {
+            "camera": CAMERA_RING + suffix,
+            "hand_gestures": HAND_GESTURES_RING + suffix,
+            "lip_reading": LIP_READING_RING + suffix,
+        }
+
+        # Shared-memory preview rings the workers publish their annotated frames into,
+        # one hub per ring; stream generators block on these until a new frame lands
+        self.frame_rings = {name: FrameRing.create(self.ring_names[name]) for name in MODES}
+        self.frame_hubs = {name: FrameHub(name) for name in MODES}
+        self._watchers = [RingWatcher(ring, self.frame_hubs[name]) for name, ring in self.frame_rings.items()]
+        for watcher in self._watchers:
+            watcher.start()
+
+        # To store last recognized output
+        self.latest_result = {"type": None, "text": ""}
+        # Recognition results are pushed to subscribers as soon as a worker sends them
+        self.result_bus = ResultBus()
+        self._switch_lock = threading.Lock()
+
+        # Warm workers: spawned once, switched on and off over IPC
+        self.worker_pool = WorkerPool(
+            self.result_bus,
+            {name: self._spawner(name, spawn) for name, spawn in spawners.items()},
+            metrics=metrics, tracer=tracer, history=history, label=self.label,
+        )
+
+        # The capture service owns this session's camera: it feeds raw frames
+        # to the workers and encodes the raw preview once for every client
+        self.frame_hubs["camera"] = FrameHub("camera")
+        self.camera_ring = FrameRing.create(self.ring_names["camera"], slot_size=CAPTURE_SLOT_SIZE)
+        self.capture_service = CaptureService(
+            lambda device: open_camera_index(device, exclude=self.other_cameras()),
+            self.camera_ring,
+            self.frame_hubs["camera"],
+            consumers=self.any_worker_active,
+            preview=lambda: not self.any_worker_active(),
+            metrics=metrics,
+            device=device,
+            component=f"capture@{self.label}" if self.label else "capture",
+        )
+        self.capture_service.start()
+
+    def _spawner(self, name: str, spawn: Callable) -> Callable:
+        """Point a worker at this session's rings before spawning it."""
+        def spawn_for_session(env):
+            env["BOLT_CAMERA_RING"] = self.ring_names["camera"]
+            env["BOLT_PREVIEW_RING"] = self.ring_names[name]
+            if self.label:
+                env["BOLT_SESSION"] = self.label
+            return spawn(env)
+        return spawn_for_session
+
+    # ---- mode switching ---- #
+    def start(self, name: str):
+        """Switch this session to one recognition mode (or COMBINED).
+
+        Returns WorkerPool.activate()'s (ok, detail).
+        """
+        names = list(MODES) if name == COMBINED else [name]
+        with self._switch_lock:
+            # 1. Stop the other mode; the camera stays with the capture
+            #    service, so this only waits for its worker to stop publishing
+            for other in MODES:
+                if other not in names and self.worker_pool.is_active(other):
+                    print(f"[INFO] Deactivating {other} worker before starting {name}...")
+                    self.worker_pool.deactivate(other)
+
+            # 2. Forget the previous session's result
+            self.result_bus.reset()
+            self.latest_result = {"type": MODES.get(name, name), "text": "No output"}
+            if self.history is not None:
+                for worker in names:
+                    self.history.begin_session(MODES[worker], source=self.label)
+            if "hand_gestures" in names:
+                write_placeholder_frame(self.frame_rings["hand_gestures"])
+
+            # 3. Activate the warm worker(s); returns once they are actually recognizing.
+            #    Still under the lock, so a concurrent start of the other mode cannot
+            #    slip in between and leave both workers running
+            return self.worker_pool.activate_many(names)
+
+    def stop(self, name: str) -> None:
+        for worker in (list(MODES) if name == COMBINED else [name]):
+            self.worker_pool.deactivate(worker)
+
+    def mode(self) -> Optional[str]:
+        """The running mode: a worker name, COMBINED, or None."""
+        active = [name for name in MODES if self.worker_pool.is_active(name)]
+        if len(active) > 1:
+            return COMBINED
+        return active[0] if active else None
+
+    def any_worker_active(self) -> bool:
+        return any(self.worker_pool.is_active(name) for name in MODES)
+
+    def current_feed_hub(self) -> FrameHub:
+        """Hub /video_feed should follow right now.
+
+        1. Lip Reading Priority, 2. Hand Gesture Priority,
+        3. Fallback to the camera preview if NO worker is active
+        """
+        if self.worker_pool.is_active("lip_reading"):
+            return self.frame_hubs["lip_reading"]
+        if self.worker_pool.is_active("hand_gestures"):
+            return self.frame_hubs["hand_gestures"]
+        return self.frame_hubs["camera"]
+
+    def latest_result_payload(self) -> dict:
+        """Most recent recognition result as a dict."""
+        event = self.result_bus.latest()
+        if event is not None:
+            return {"type": event["type"], "text": event["text"]}
+        # Fallback to the in-memory latest_result set when the worker started
+        return self.latest_result
+
+    def status(self) -> dict:
+        return {"session": self.id, "camera": self.device,
+                "camera_index": self.capture_service.camera_index, "mode": self.mode(),
+                "workers": self.worker_pool.status()}
+
+    def close(self) -> None:
+        """Stop the workers and the camera and free the shared memory."""
+        self.worker_pool.shutdown()
+        self.capture_service.stop()
+        for watcher in self._watchers:
+            watcher.stop()
+        for ring in list(self.frame_rings.values()) + [self.camera_ring]:
+            ring.close()
+
+
+class SessionRegistry:
+    """Camera sessions by id; each camera device can belong to one session only."""
+
+    def __init__(self, factory: Callable[[str, int], CameraSession]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, CameraSession] = {}
+
+    def create(self, session_id: str, device: int) -> CameraSession:
+        """Start a session; raises ValueError for a bad id or a taken id/camera."""
+        if not SESSION_ID.match(session_id):
+            raise ValueError("session id must be 1-24 letters, digits, '-' or '_'")
+        with self._lock:
+            if session_id in self._sessions:
+                raise ValueError(f"session {session_id} already exists")
+            for other in self._sessions.values():
+                # device 0 means "any camera": compare with the index it actually opened
+                if other.device == device or (device != 0 and other.capture_service.camera_index == device):
+                    raise ValueError(f"camera {device} is already used by session {other.id}")
+            session = self._sessions[session_id] = self._factory(session_id, device)
+            session.other_cameras = lambda: self.cameras_in_use(skip=session)
+        print(f"[INFO] Camera session {session_id} started on camera {device}")
+        return session
+
+    def cameras_in_use(self, skip: Optional[CameraSession] = None) -> set:
+        """Camera indices the sessions (other than ``skip``) have opened or asked for."""
+        used = set()
+        for session in list(self._sessions.values()):
+            if session is skip:
+                continue
+            if session.device != 0:
+                used.add(session.device)
+            if session.capture_service.camera_index is not None:
+                used.add(session.capture_service.camera_index)
+        return used
+
+    def get(self, session_id: str) -> Optional[CameraSession]:
+        return self._sessions.get(session_id)
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        print(f"[INFO] Camera session {session_id} closed")
+        return True
+
+    def all(self):
+        return list(self._sessions.values())
+
+    def close_all(self) -> None:
+        for session_id in list(self._sessions):
+            self.remove(session_id)
@@ -0,0 +1,286 @@
+"""
+Change-driven frame fan-out for the MJPEG endpoints.
+
+A FrameHub holds the newest encoded frame together with a sequence number.
+Stream generators block on the hub until a frame newer than the one they
+last sent is published, so an idle producer costs no bandwidth and a fast
+one is never throttled by a fixed sleep. Readers that fall behind simply
+skip to the newest frame (latest-frame-wins).
+
+A RingWatcher bridges a worker's shared-memory FrameRing into a hub. It only
+polls the ring's sequence counter while someone is actually watching.
+
+Clients may ask for a smaller or lower-quality rendition of a feed. Each
+distinct rendition is computed at most once per source frame by the hub's
+RenditionCache and shared by every client that asked for the same one.
+
+/snapshot serves single frames. Their ETag is derived from the hub and the
+frame's sequence number, so a poller that already has the newest frame gets
+a 304 without any image bytes, or can long-poll for the next one.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+Frame = namedtuple("Frame", ["seq", "timestamp", "data"])
+Rendition = namedtuple("Rendition", ["width", "height", "quality"])
+
+MAX_RENDITIONS = 16
+SNAPSHOT_MAX_AGE = 1.0   # s; an older frame is refreshed before it is served as a snapshot
+MAX_SNAPSHOT_WAIT = 30.0  # s; cap on ?wait= long-polls
+_ETAG_EPOCH = format(int(time.time()), "x")  # sequence numbers restart with the server
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def mjpeg_part(data: bytes) -> bytes:
+    """Wrap one JPEG as a multipart/x-mixed-replace chunk."""
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + data + b'\r\n'
+
+
+def parse_stream_args(args) -> Tuple[Optional[Rendition], Optional[float]]:
+    """Read ``width``, ``height``, ``quality`` and ``fps`` from request query args.
+
+    Returns ``(rendition, max_fps)``; ``rendition`` is None when the client
+    wants the source frames untouched. Raises ValueError on bad values.
+    """
+    def _num(key, cast, lo, hi):
+        raw = args.get(key)
+        if raw in (None, ""):
+            return None
+        value = cast(raw)
+        if not lo <= value <= hi:
+            raise ValueError(f"{key} must be between {lo} and {hi}")
+        return value
+
+    width = _num("width", int, 16, 1920)
+    height = _num("height", int, 16, 1080)
+    quality = _num("quality", int, 10, 95)
+    max_fps = _num("fps", float, 0.1, 60.0)
+    if width is None and height is None and quality is None:
+        return None, max_fps
+    return Rendition(width or 0, height or 0, quality or 85), max_fps
+
+
+def parse_snapshot_wait(args) -> float:
+    """Seconds a /snapshot request may wait for a newer frame (``wait``, default 0)."""
+    raw = args.get("wait")
+    if raw in (None, ""):
+        return 0.0
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError("wait must be a number")
+    if not 0 <= value <= MAX_SNAPSHOT_WAIT:
+        raise ValueError(f"wait must be between 0 and {MAX_SNAPSHOT_WAIT:g}")
+    return value
+
+
+def snapshot_etag(hub_name: str, frame: Frame, rendition: Optional[Rendition]) -> str:
+    """Strong ETag for ``frame`` of hub ``hub_name`` in the given rendition."""
+    tag = f"{hub_name}-{_ETAG_EPOCH}-{frame.seq}"
+    if rendition is not None:
+        tag += f"-{rendition.width}x{rendition.height}q{rendition.quality}"
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value names ``etag`` (or is ``*``)."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class RenditionCache:
+    """Per-hub cache of downscaled / re-encoded copies of the current frame."""
+
+    def __init__(self, max_entries: int = MAX_RENDITIONS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # Rendition -> [lock, seq, data]
+        self._source_size = None  # (w, h) of the last decoded source frame
+
+    def get(self, frame: Frame, rendition: Rendition) -> bytes:
+        with self._lock:
+            entry = self._entries.get(rendition)
+            if entry is None:
+                entry = self._entries[rendition] = [threading.Lock(), 0, b""]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(rendition)
+        with entry[0]:
+            # the first client to ask for this frame renders it, the rest reuse it
+            if entry[1] != frame.seq:
+                entry[2] = self._render(frame.data, rendition)
+                entry[1] = frame.seq
+            return entry[2]
+
+    def _render(self, data: bytes, rendition: Rendition) -> bytes:
+        buf = np.frombuffer(data, dtype=np.uint8)
+        flag, factor = cv2.IMREAD_COLOR, 1
+        if self._source_size is not None and (rendition.width or rendition.height):
+            # let libjpeg do most of the downscale while decoding
+            src_w, src_h = self._source_size
+            for factor, reduced in _REDUCED_FLAGS:
+                if (not rendition.width or rendition.width * factor <= src_w) and \
+                        (not rendition.height or rendition.height * factor <= src_h):
+                    flag = reduced
+                    break
+            else:
+                factor = 1
+        img = cv2.imdecode(buf, flag)
+        if img is not None and factor > 1 and (rendition.width > img.shape[1] or rendition.height > img.shape[0]):
+            # the source shrank since its size was recorded: decode again at full size
+            img, factor = cv2.imdecode(buf, cv2.IMREAD_COLOR), 1
+        if img is None:
+            return data
+        self._source_size = (img.shape[1] * factor, img.shape[0] * factor)
+        target = _target_size(img.shape[1], img.shape[0], rendition)
+        if target != (img.shape[1], img.shape[0]):
+            img = cv2.resize(img, target, interpolation=cv2.INTER_AREA)
+        ok, out = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, rendition.quality])
+        return out.tobytes() if ok else data
+
+
+def _resolve(fut: asyncio.Future, frame: Frame) -> None:
+    if not fut.done():
+        fut.set_result(frame)
+
+
+def _target_size(w: int, h: int, rendition: Rendition) -> Tuple[int, int]:
+    """Fit ``w x h`` inside the requested box, keeping aspect ratio and never upscaling."""
+    scale = 1.0
+    if rendition.width:
+        scale = min(scale, rendition.width / w)
+    if rendition.height:
+        scale = min(scale, rendition.height / h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+class FrameHub:
+    """Latest-frame-wins broadcast of encoded frames to any number of readers."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._cond = threading.Condition()
+        self._frame: Optional[Frame] = None
+        self._readers = 0
+        self._async_waiters = []  # (loop, future) pairs from wait_for_async
+        self.renditions = RenditionCache()
+
+    def render(self, frame: Frame, rendition: Optional[Rendition]) -> bytes:
+        """Bytes to send for ``frame`` in the given rendition (None = as published)."""
+        if rendition is None:
+            return frame.data
+        return self.renditions.get(frame, rendition)
+
+    def publish(self, data: bytes, timestamp: Optional[float] = None) -> int:
+        """Replace the current frame and wake every waiting reader."""
+        with self._cond:
+            seq = self._frame.seq + 1 if self._frame else 1
+            frame = self._frame = Frame(seq, time.time() if timestamp is None else timestamp, data)
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, fut, frame)
+            except RuntimeError:
+                pass  # event loop already closed
+        return seq
+
+    def latest(self) -> Optional[Frame]:
+        return self._frame
+
+    def fresh(self, max_age: float = SNAPSHOT_MAX_AGE, timeout: float = 2.0) -> Optional[Frame]:
+        """The current frame if it is recent, otherwise the next one to be published.
+
+        Producers only run while someone waits on the hub, so an idle hub's
+        frame can be arbitrarily old; waiting here wakes them. Falls back to
+        the old frame (or None) after ``timeout``.
+        """
+        frame = self._frame
+        if frame is not None and time.time() - frame.timestamp <= max_age:
+            return frame
+        return self.wait_for(frame.seq if frame else 0, timeout) or frame
+
+    def wait_for(self, after_seq: int, timeout: Optional[float] = None) -> Optional[Frame]:
+        """Block until a frame with ``seq > after_seq`` exists and return it (None on timeout)."""
+        with self._cond:
+            self._readers += 1
+            self._cond.notify_all()  # wake a RingWatcher parked in wait_for_readers
+            try:
+                self._cond.wait_for(lambda: self._frame is not None and self._frame.seq > after_seq, timeout)
+            finally:
+                self._readers -= 1
+            frame = self._frame
+        if frame is not None and frame.seq > after_seq:
+            return frame
+        return None
+
+    async def wait_for_async(self, after_seq: int, timeout: Optional[float] = None) -> Optional[Frame]:
+        """Coroutine version of wait_for: parks a future instead of a thread."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        waiter = (loop, fut)
+        with self._cond:
+            frame = self._frame
+            if frame is not None and frame.seq > after_seq:
+                return frame
+            self._async_waiters.append(waiter)
+            self._readers += 1
+            self._cond.notify_all()
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+
+    @property
+    def readers(self) -> int:
+        return self._readers
+
+    def wait_for_readers(self, timeout: float) -> bool:
+        """Park a producer until at least one reader is blocked on the hub."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._readers > 0, timeout)
+
+
+class RingWatcher(threading.Thread):
+    """Republish every new frame of a shared-memory FrameRing into a FrameHub."""
+
+    def __init__(self, ring, hub: FrameHub, interval: float = 0.005):
+        super().__init__(name=f"ring-watcher-{hub.name}", daemon=True)
+        self.ring = ring
+        self.hub = hub
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last_seq = 0
+        while not self._stop_event.is_set():
+            if not self.hub.wait_for_readers(timeout=1.0):
+                continue
+            try:
+                seq = self.ring.latest_seq()
+                if seq != last_seq:
+                    latest = self.ring.read(seq)
+                    if latest is not None:
+                        last_seq = seq
+                        self.hub.publish(latest[2], timestamp=latest[1])
+            except Exception as e:
+                print(f"[WARN] RingWatcher {self.hub.name} error:", e)
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
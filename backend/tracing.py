@@ -0,0 +1,99 @@
+"""
+Opt-in per-frame tracing in Chrome trace format.
+
+A Tracer records complete ("ph": "X") events into a bounded deque, so a
+forgotten trace session costs a fixed amount of memory and nothing else.
+While disabled, recording is a single attribute check.
+
+Stage timings recorded through metrics.StageMetrics / MetricsRegistry are
+mirrored into the tracer automatically; the worker loops add one "frame"
+span per processed frame around them. Workers ship their events to the
+server with each heartbeat, so GET /trace returns a single file covering the
+server and every worker, ready for chrome://tracing or ui.perfetto.dev.
+
+Switch it on with BOLT_TRACE=1 at startup or with POST /trace/start at
+runtime.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+TRACE_ENV = "BOLT_TRACE"
+DEFAULT_CAPACITY = 200_000
+
+# wall-clock anchor so timestamps from different processes line up
+_WALL0 = time.time()
+_PERF0 = time.perf_counter()
+
+
+def _us(perf: float) -> float:
+    return round((_WALL0 + (perf - _PERF0)) * 1e6, 1)
+
+
+class Tracer:
+    def __init__(self, process_name: str, capacity: int = DEFAULT_CAPACITY, enabled: Optional[bool] = None):
+        self.process_name = process_name
+        self.pid = os.getpid()
+        self.enabled = os.environ.get(TRACE_ENV, "0") not in ("", "0") if enabled is None else enabled
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def complete(self, name: str, start: float, end: float, cat: str = "stage", **args) -> None:
+        """Record a span between two ``time.perf_counter()`` readings."""
+        if not self.enabled:
+            return
+        event = {"name": name, "cat": cat, "ph": "X", "ts": _us(start), "dur": round((end - start) * 1e6, 1),
+                 "pid": self.pid, "tid": threading.get_native_id()}
+        if args:
+            event["args"] = args
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._dropped += 1
+            self._events.append(event)
+
+    def extend(self, events: List[dict]) -> None:
+        """Add events recorded by another process (a worker's heartbeat)."""
+        with self._lock:
+            overflow = len(self._events) + len(events) - self._events.maxlen
+            if overflow > 0:
+                self._dropped += overflow
+            self._events.extend(events)
+
+    def drain(self, limit: int = 5000) -> List[dict]:
+        """Remove and return up to ``limit`` of the oldest events."""
+        with self._lock:
+            n = min(limit, len(self._events))
+            return [self._events.popleft() for _ in range(n)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._dropped = 0
+
+    def status(self) -> dict:
+        return {"enabled": self.enabled, "events": len(self._events),
+                "capacity": self._events.maxlen, "dropped": self._dropped}
+
+    def to_chrome(self, process_names: Optional[dict] = None) -> dict:
+        """The buffer as a Chrome trace document; ``process_names`` maps pid -> label."""
+        names = {self.pid: self.process_name}
+        names.update(process_names or {})
+        with self._lock:
+            events = list(self._events)
+        meta = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label}}
+                for pid, label in names.items() if pid is not None]
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str, process_names: Optional[dict] = None) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(process_names), f)
+        os.replace(tmp, path)
+        return path
@@ -0,0 +1,231 @@
+"""
+Local IPC between the recognition workers and the Flask server.
+
+The server runs a WorkerListener on a loopback socket (multiprocessing
+connection, authenticated with a per-server random key) and hands its address
+to the workers through environment variables. Each worker opens one
+WorkerLink to it, announces itself, and then:
+
+  * posts typed events (results, state changes) from a background thread,
+    so the capture loop never blocks on the socket or touches the disk;
+    when the server stops draining, results and heartbeats are dropped, but
+    hello and state messages (the supervisor's state machine) never are;
+  * sends a heartbeat every HEARTBEAT_INTERVAL seconds, carrying a counter
+    the capture loop bumps with tick() so the server can tell a stalled
+    loop from an idle one, plus the stage timings and counters recorded in
+    ``link.metrics`` (and, while tracing, the spans in ``link.tracer``)
+    since the previous heartbeat;
+  * receives commands from the server (activate / deactivate / shutdown);
+    trace on/off commands are applied by the link itself.
+
+Worker -> server messages (plain dicts):
+    {"kind": "hello", "worker": "hand_gestures" | "lip_reading", "pid": int}
+    {"kind": "state", "worker": ..., "state": "idle" | "active" | "error", "detail": str}
+        ("idle" is also the ready handshake: models are loaded)
+    {"kind": "heartbeat", "worker": ..., "frames": int, "metrics": dict | None,
+     "trace": [chrome trace events]}   ("trace" only while there are spans to ship)
+    {"kind": "result", "type": "hand-gesture" | "lip-reading",
+     "label": str, "confidence": float | None,
+     "timestamp": float (capture time), "frame_id": int}
+
+Server -> worker commands:
+    {"cmd": "activate"} | {"cmd": "deactivate"} | {"cmd": "shutdown"}
+    {"cmd": "trace", "on": bool}
+"""
+from __future__ import annotations
+
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Optional
+
+from metrics import StageMetrics
+from tracing import Tracer
+
+ADDR_ENV = "BOLT_IPC_ADDR"
+KEY_ENV = "BOLT_IPC_KEY"
+HEARTBEAT_INTERVAL = 1.0
+
+# messages the supervisor's state machine depends on; never dropped
+_CONTROL_KINDS = ("hello", "state")
+
+
+# --------------------- #
+# Server side
+# --------------------- #
+class WorkerListener(threading.Thread):
+    """Accept worker connections and hand every message to ``on_message(conn, msg)``.
+
+    ``on_disconnect(conn)`` is called once a worker's connection closes.
+    """
+
+    def __init__(self, on_message: Callable, on_disconnect: Optional[Callable] = None, host: str = "127.0.0.1"):
+        super().__init__(name="worker-ipc-listener", daemon=True)
+        self.on_message = on_message
+        self.on_disconnect = on_disconnect
+        self._authkey = secrets.token_bytes(16)
+        self._listener = Listener((host, 0), authkey=self._authkey)
+        self.address = self._listener.address
+        self._closed = False
+
+    def child_env(self, base: Optional[dict] = None) -> dict:
+        """Environment for a worker subprocess so it can find this listener."""
+        env = dict(os.environ if base is None else base)
+        env[ADDR_ENV] = f"{self.address[0]}:{self.address[1]}"
+        env[KEY_ENV] = self._authkey.hex()
+        return env
+
+    def run(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if self._closed:
+                    return
+                print("[WARN] Worker IPC accept failed:", e)
+                time.sleep(0.1)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="worker-ipc-conn", daemon=True).start()
+
+    def close(self) -> None:
+        self._closed = True
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+
+    def _serve(self, conn):
+        try:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return  # worker exited
+                try:
+                    self.on_message(conn, msg)
+                except Exception as e:
+                    print("[WARN] Bad worker IPC message:", e)
+        finally:
+            if self.on_disconnect is not None:
+                self.on_disconnect(conn)
+            conn.close()
+
+
+# --------------------- #
+# Worker side
+# --------------------- #
+class WorkerLink:
+    """A worker's connection to the server: non-blocking events out, commands in."""
+
+    def __init__(self, worker: str, address, authkey: bytes, maxsize: int = 256):
+        self.worker = worker
+        self._conn = Client(address, authkey=authkey)
+        # unbounded, but at most ``maxsize`` droppable messages are queued at a time
+        self._queue = queue.Queue()
+        self._maxsize = maxsize
+        self._droppable = 0
+        self._count_lock = threading.Lock()
+        self.frames = 0
+        self.tracer = Tracer(worker, capacity=20_000)
+        self.metrics = StageMetrics(tracer=self.tracer)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._pump, name="worker-link", daemon=True)
+        self._thread.start()
+        self.post({"kind": "hello", "worker": worker, "pid": os.getpid()})
+        threading.Thread(target=self._heartbeat, name="worker-heartbeat", daemon=True).start()
+
+    @classmethod
+    def from_env(cls, worker: str) -> Optional["WorkerLink"]:
+        """Connect to the server named in the environment, or return None when running standalone."""
+        addr = os.environ.get(ADDR_ENV)
+        key = os.environ.get(KEY_ENV)
+        if not addr or not key:
+            print("[WARN] No server link configured; running standalone.")
+            return None
+        host, port = addr.rsplit(":", 1)
+        try:
+            return cls(worker, (host, int(port)), bytes.fromhex(key))
+        except Exception as e:
+            print(f"[WARN] Could not connect to server at {addr}: {e}")
+            return None
+
+    # ---- events ---- #
+    def result(self, type_: str, label: str, confidence: Optional[float] = None,
+               timestamp: Optional[float] = None, frame_id: Optional[int] = None) -> None:
+        self.post({
+            "kind": "result",
+            "type": type_,
+            "label": str(label),
+            "confidence": None if confidence is None else float(confidence),
+            "timestamp": time.time() if timestamp is None else timestamp,
+            "frame_id": frame_id,
+        })
+
+    def state(self, state: str, detail: str = "") -> None:
+        self.post({"kind": "state", "worker": self.worker, "state": state, "detail": detail})
+
+    def tick(self) -> None:
+        """Count one processed frame (reported with the next heartbeat)."""
+        self.frames += 1
+        self.metrics.count("frames_processed")
+
+    def post(self, msg: dict) -> None:
+        droppable = msg.get("kind") not in _CONTROL_KINDS
+        if droppable:
+            with self._count_lock:
+                if self._droppable >= self._maxsize:
+                    return  # server is not draining; never stall the capture loop
+                self._droppable += 1
+        self._queue.put((droppable, msg))
+
+    def _heartbeat(self):
+        while not self._closed.wait(HEARTBEAT_INTERVAL):
+            msg = {"kind": "heartbeat", "worker": self.worker, "frames": self.frames,
+                   "metrics": self.metrics.drain()}
+            spans = self.tracer.drain()
+            if spans:
+                msg["trace"] = spans
+            self.post(msg)
+
+    def _pump(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            droppable, msg = item
+            if droppable:
+                with self._count_lock:
+                    self._droppable -= 1
+            try:
+                self._conn.send(msg)
+            except (OSError, EOFError):
+                break
+
+    # ---- commands ---- #
+    def command(self, timeout: Optional[float] = 0.0) -> Optional[str]:
+        """Next command from the server, waiting up to ``timeout`` seconds (None = forever).
+
+        Returns "shutdown" if the server went away.
+        """
+        try:
+            if not self._conn.poll(timeout):
+                return None
+            msg = self._conn.recv()
+        except (EOFError, OSError):
+            return "shutdown"
+        if msg.get("cmd") == "trace":
+            self.tracer.enabled = bool(msg.get("on"))
+            return None
+        return msg.get("cmd")
+
+    def close(self) -> None:
+        self._closed.set()
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+        try:
+            self._conn.close()
+        except Exception:
+            pass
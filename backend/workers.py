@@ -0,0 +1,397 @@
+"""
+Warm, long-lived recognition workers under a supervisor.
+
+Each worker process (hand_gestures/main.py, Lip-Reading/demo/predict_live.py)
+is started once, pays for its imports and model loading up front, and then
+idles until the server sends it an "activate" command over its WorkerLink.
+Switching modes is just a deactivate/activate pair of IPC messages.
+
+Per worker the pool tracks what the server wants ("active" / "idle") and an
+explicit state:
+
+    stopped -> spawning -> loading -> idle <-> starting -> active
+                                        ^                    |
+                                        +---- stopping <-----+
+    error    the worker is alive but could not start a session
+    crashed  the process died, missed its heartbeats or stalled; restart pending
+    failed   too many restarts within RESTART_WINDOW; left down until the
+             next activate()
+
+"loading" lasts from the worker's hello until its ready handshake (a
+"state: idle" message once its models are loaded); "starting" until it
+reports "active", i.e. its frame source is open. activate() and
+deactivate() wait for those transitions instead of sleeping.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from worker_ipc import WorkerListener
+
+RESULT_WORKERS = {"hand-gesture": "hand_gestures", "lip-reading": "lip_reading"}
+
+HEARTBEAT_TIMEOUT = 5.0    # no heartbeat for this long: the worker is hung
+STARTUP_TIMEOUT = 120.0    # spawn -> ready handshake (TensorFlow is slow to import)
+STALL_TIMEOUT = 10.0       # active but no frame processed for this long
+STALL_KILL_TIMEOUT = 30.0  # ... and for this long: the frame loop is hung, restart it
+MAX_RESTARTS = 3           # automatic restarts allowed within RESTART_WINDOW
+RESTART_WINDOW = 60.0
+
+# states in which a wanted-active worker is (or is about to be) serving
+_LIVE_STATES = ("spawning", "loading", "idle", "starting", "active", "crashed")
+
+
+class WorkerHandle:
+    def __init__(self, name: str, spawn: Callable, label: str = ""):
+        self.name = name
+        self.component = f"{name}@{label}" if label else name  # name in metrics, traces and logs
+        self.spawn = spawn  # callable(env) -> Popen
+        self.proc = None
+        self.conn = None
+        self.state = "stopped"
+        self.wanted = "idle"
+        self.detail = ""
+        self.since = time.time()  # when the state last changed
+        self.last_heartbeat = 0.0
+        self.frames = 0
+        self.frames_changed_at = 0.0
+        self.restarts = deque()   # times of automatic restarts
+        self.restart_at = 0.0     # earliest time for the next automatic restart
+        self.outcome = None       # result of the pending activation
+        self.last_latency_ms = None  # capture-to-result of the latest result
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def set_state(self, state: str, detail: str = "") -> None:
+        if state != self.state:
+            self.since = time.time()
+        self.state = state
+        self.detail = detail
+
+
+class WorkerPool:
+    """Spawn workers once, switch them on and off over IPC, and keep them healthy."""
+
+    def __init__(self, bus, spawners: Dict[str, Callable], metrics=None, tracer=None, history=None,
+                 label: str = ""):
+        self.bus = bus
+        self.label = label  # camera session this pool serves ("" for the default one)
+        self.history = history  # HistoryStore every published result is recorded in
+        self.metrics = metrics  # MetricsRegistry the workers' heartbeats are merged into
+        self.tracer = tracer    # Tracer the workers' trace spans are collected into
+        self._cond = threading.Condition()
+        self._handles = {name: WorkerHandle(name, spawn, label) for name, spawn in spawners.items()}
+        self._send_lock = threading.Lock()
+        self._shutting_down = False
+        self.listener = WorkerListener(self._on_message, self._on_disconnect)
+        self.listener.start()
+        threading.Thread(target=self._supervise, name="worker-supervisor", daemon=True).start()
+
+    # ---- lifecycle ---- #
+    def prewarm(self) -> None:
+        """Start every worker now so the first activation is instant."""
+        for name in self._handles:
+            self.ensure_running(name)
+
+    def ensure_running(self, name: str) -> None:
+        handle = self._handles[name]
+        with self._cond:
+            if handle.alive() or handle.state == "spawning" or self._shutting_down:
+                return
+            handle.proc = None
+            handle.conn = None
+            handle.set_state("spawning")
+        proc = handle.spawn(self.listener.child_env())
+        with self._cond:
+            handle.proc = proc
+            handle.last_heartbeat = time.time()
+            self._cond.notify_all()
+        if proc is None:
+            self._crashed(handle, "failed to start")
+
+    def shutdown(self) -> None:
+        self._shutting_down = True
+        for handle in self._handles.values():
+            self._send(handle, "shutdown")
+        for handle in self._handles.values():
+            if handle.proc is None:
+                continue
+            try:
+                handle.proc.wait(timeout=2)
+            except Exception:
+                try:
+                    handle.proc.kill()
+                except Exception:
+                    pass
+        self.listener.close()
+
+    # ---- mode switching ---- #
+    def activate(self, name: str, timeout: float = 30.0) -> Tuple[bool, str]:
+        """Ask a worker to start recognizing frames from the capture service.
+
+        Blocks until the worker reports "active" (returns ``(True, "active")``)
+        or gives up (``(False, reason)``). If it is still warming up after
+        ``timeout`` seconds, returns ``(True, "starting")``; the worker then
+        activates as soon as its ready handshake arrives.
+        """
+        return self.activate_many([name], timeout)
+
+    def activate_many(self, names: List[str], timeout: float = 30.0) -> Tuple[bool, str]:
+        """activate() several workers at once; fails as soon as any of them does."""
+        handles = [self._handles[name] for name in names]
+        send_now = []
+        moved = []  # handles this call switched on; rolled back if another one fails
+        with self._cond:
+            for handle in handles:
+                if handle.wanted != "active":
+                    moved.append(handle)
+                handle.wanted = "active"
+                handle.outcome = None
+                if handle.state == "failed":
+                    # an explicit request gets a fresh restart budget
+                    handle.restarts.clear()
+                    handle.set_state("stopped")
+                if handle.state in ("idle", "error"):
+                    handle.set_state("starting")
+                    send_now.append(handle)
+                elif handle.state == "active":
+                    handle.outcome = "active"  # already serving (e.g. combined -> single mode)
+        for handle in handles:
+            self.ensure_running(handle.name)
+        for handle in send_now:
+            self._send(handle, "activate")
+
+        def failures():
+            return [h for h in handles if h.outcome not in (None, "active")]
+
+        with self._cond:
+            settled = self._cond.wait_for(
+                lambda: failures() or all(h.outcome is not None for h in handles), timeout)
+            failed = failures()
+        if failed:
+            # never leave a half-started set running after reporting failure
+            for handle in moved:
+                if handle.wanted == "active" or handle.state in ("starting", "active"):
+                    self.deactivate(handle.name)
+            if len(handles) == 1:
+                return False, failed[0].outcome
+            return False, "; ".join(f"{h.name}: {h.outcome}" for h in failed)
+        if not settled:
+            return True, "starting"
+        return True, "active"
+
+    def deactivate(self, name: str, timeout: float = 3.0) -> bool:
+        """Ask a worker to stop recognizing and wait until it reports it has stopped."""
+        handle = self._handles[name]
+        with self._cond:
+            handle.wanted = "idle"
+            was_running = handle.state in ("starting", "active")
+            if was_running:
+                handle.set_state("stopping")
+            self._cond.notify_all()
+        if not was_running:
+            return True
+        self._send(handle, "deactivate")
+        with self._cond:
+            return self._cond.wait_for(lambda: handle.state != "stopping" or not handle.alive(), timeout)
+
+    def set_tracing(self, on: bool) -> None:
+        """Switch span recording on or off in every connected worker."""
+        for handle in self._handles.values():
+            self._send(handle, "trace", on=on)
+
+    def process_names(self) -> dict:
+        """pid -> worker name, for labelling trace files."""
+        return {h.proc.pid: h.component for h in self._handles.values() if h.proc is not None}
+
+    def is_active(self, name: str) -> bool:
+        """True while a worker is wanted active and is (or is becoming) able to serve it."""
+        handle = self._handles[name]
+        return handle.wanted == "active" and handle.state in _LIVE_STATES
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            name: {"state": h.state, "wanted": h.wanted, "pid": getattr(h.proc, "pid", None),
+                   "detail": h.detail, "state_age_s": round(now - h.since, 1),
+                   "restarts": len(h.restarts), "frames": h.frames,
+                   "last_latency_ms": h.last_latency_ms}
+            for name, h in self._handles.items()
+        }
+
+    # ---- supervision ---- #
+    def _supervise(self):
+        while not self._shutting_down:
+            time.sleep(0.5)
+            for handle in self._handles.values():
+                try:
+                    self._check(handle)
+                except Exception as e:
+                    print(f"[WARN] Supervisor check of {handle.component} failed:", e)
+
+    def _check(self, handle: WorkerHandle) -> None:
+        now = time.time()
+        if self._shutting_down or handle.state in ("stopped", "failed"):
+            return
+        if handle.state == "crashed":
+            if now >= handle.restart_at:
+                self._restart(handle)
+            return
+        if handle.proc is None:
+            return  # still being spawned
+        if not handle.alive():
+            self._crashed(handle, f"exited with code {handle.proc.poll()}")
+        elif handle.state in ("spawning", "loading") and now - handle.since > STARTUP_TIMEOUT:
+            self._kill(handle, f"not ready after {STARTUP_TIMEOUT:.0f}s")
+        elif handle.conn is not None and now - handle.last_heartbeat > HEARTBEAT_TIMEOUT:
+            self._kill(handle, "missed heartbeats")
+        elif handle.state == "active" and now - handle.frames_changed_at > STALL_KILL_TIMEOUT:
+            # heartbeats come from their own thread, so only the frame counter shows a hung loop
+            self._kill(handle, f"no frame processed for {STALL_KILL_TIMEOUT:.0f}s")
+        elif (handle.state == "active" and handle.detail != "stalled"
+              and now - handle.frames_changed_at > STALL_TIMEOUT):
+            print(f"[WARN] Worker {handle.component} has not processed a frame for {STALL_TIMEOUT:.0f}s")
+            handle.detail = "stalled"
+
+    def _kill(self, handle: WorkerHandle, reason: str) -> None:
+        print(f"[WARN] Killing worker {handle.name}: {reason}")
+        try:
+            handle.proc.kill()
+        except Exception:
+            pass
+        self._crashed(handle, reason)
+
+    def _crashed(self, handle: WorkerHandle, reason: str) -> None:
+        now = time.time()
+        with self._cond:
+            while handle.restarts and now - handle.restarts[0] > RESTART_WINDOW:
+                handle.restarts.popleft()
+            handle.conn = None
+            if len(handle.restarts) >= MAX_RESTARTS:
+                print(f"[ERROR] Worker {handle.component} {reason}; giving up after {MAX_RESTARTS} restarts")
+                handle.set_state("failed", reason)
+                handle.wanted = "idle"
+                if handle.outcome is None:
+                    handle.outcome = f"failed: {reason}"
+            else:
+                delay = 2 ** len(handle.restarts)
+                print(f"[WARN] Worker {handle.component} {reason}; restarting in {delay}s")
+                handle.set_state("crashed", reason)
+                handle.restart_at = now + delay
+            self._cond.notify_all()
+
+    def _restart(self, handle: WorkerHandle) -> None:
+        with self._cond:
+            handle.restarts.append(time.time())
+        self.ensure_running(handle.name)
+
+    # ---- IPC plumbing ---- #
+    def _send(self, handle: WorkerHandle, cmd: str, **extra) -> bool:
+        conn = handle.conn
+        if conn is None:
+            return False
+        try:
+            with self._send_lock:
+                conn.send(dict(extra, cmd=cmd))
+            return True
+        except (OSError, EOFError):
+            return False
+
+    def _on_message(self, conn, msg: dict) -> None:
+        kind = msg.get("kind")
+        if kind == "result":
+            captured_at = msg.get("timestamp") or time.time()
+            latency_ms = round((time.time() - captured_at) * 1000.0, 1)
+            handle = self._handle_for(msg["type"])
+            if handle is not None:
+                handle.last_latency_ms = latency_ms
+                if self.metrics is not None:
+                    self.metrics.observe(handle.component, "capture_to_result", latency_ms / 1000.0)
+                    self.metrics.count(handle.component, "results")
+            event = self.bus.publish(
+                msg["type"], msg["label"],
+                confidence=msg.get("confidence"),
+                timestamp=captured_at,
+                frame_id=msg.get("frame_id"),
+                latency_ms=latency_ms,
+            )
+            if self.history is not None:
+                self.history.record(event, source=self.label)
+            return
+        handle = self._handles.get(msg.get("worker"))
+        if handle is None:
+            return
+        if kind == "heartbeat":
+            now = time.time()
+            frames = msg.get("frames", 0)
+            if self.metrics is not None and msg.get("metrics"):
+                self.metrics.merge(handle.component, msg["metrics"])
+            if self.tracer is not None and msg.get("trace"):
+                self.tracer.extend(msg["trace"])
+            with self._cond:
+                handle.last_heartbeat = now
+                if frames != handle.frames:
+                    handle.frames = frames
+                    handle.frames_changed_at = now
+                    if handle.detail == "stalled":
+                        handle.detail = ""
+        elif kind == "hello":
+            with self._cond:
+                handle.conn = conn
+                handle.last_heartbeat = time.time()
+                handle.set_state("loading")
+                self._cond.notify_all()
+            print(f"[INFO] Worker {handle.component} connected (pid={msg.get('pid')}); loading models")
+            if self.tracer is not None:
+                self._send(handle, "trace", on=self.tracer.enabled)
+        elif kind == "state":
+            self._on_state(handle, msg.get("state", ""), msg.get("detail", ""))
+
+    def _on_state(self, handle: WorkerHandle, state: str, detail: str) -> None:
+        send_activate = False
+        with self._cond:
+            if state == "idle":
+                if handle.state == "loading":
+                    print(f"[INFO] Worker {handle.component} ready")
+                if handle.state == "starting":
+                    pass  # a previous session wound down; the activation is in flight
+                elif handle.wanted == "active" and handle.state in ("loading", "idle", "stopping"):
+                    # ready handshake while an activation is pending
+                    send_activate = True
+                    handle.set_state("starting")
+                else:
+                    if handle.state == "active":
+                        handle.wanted = "idle"  # session ended on the worker's side
+                    handle.set_state("idle", handle.detail if handle.state == "error" else "")
+            elif state == "active":
+                handle.set_state("active")
+                handle.frames_changed_at = time.time()
+                handle.outcome = "active"
+            elif state == "error":
+                print(f"[ERROR] Worker {handle.component} error: {detail}")
+                handle.set_state("error", detail)
+                handle.wanted = "idle"
+                handle.outcome = f"error: {detail}"
+            else:
+                handle.set_state(state, detail)
+            self._cond.notify_all()
+        if send_activate:
+            self._send(handle, "activate")
+
+    def _on_disconnect(self, conn) -> None:
+        with self._cond:
+            for handle in self._handles.values():
+                if handle.conn is conn:
+                    handle.conn = None
+            self._cond.notify_all()
+
+    def handle(self, name: str) -> Optional[WorkerHandle]:
+        return self._handles.get(name)
+
+    def _handle_for(self, result_type: str) -> Optional[WorkerHandle]:
+        """Worker that produces results of ``result_type`` ("hand-gesture" -> hand_gestures)."""
+        return self._handles.get(RESULT_WORKERS.get(result_type, ""))
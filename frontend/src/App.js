@@ -50,7 +50,7 @@ const AppContent = () => {
   // --- Refs ---
   const videoRef = useRef(null); // Local video ref
   const streamRef = useRef(null);
-  const processingIntervalRef = useRef(null);
+  const resultStreamRef = useRef(null);
 
   // --- Toasts (Simplified) ---
   // --- Toasts ---
@@ -146,9 +146,20 @@ const AppContent = () => {
     setUseServerVideo(false);
   };
 
+  // --- Result Stream (Server-Sent Events) ---
+  const subscribeResults = (onResult) => {
+    const source = new EventSource('http://127.0.0.1:5000/result_stream');
+    source.addEventListener('result', (e) => {
+      try {
+        onResult(JSON.parse(e.data));
+      } catch (err) { console.error('Result stream error', err); }
+    });
+    return source;
+  };
+
   // --- Lip Reading Logic ---
   const startLipReading = async () => {
-    if (isLipReadingLive || processingIntervalRef.current) return;
+    if (isLipReadingLive || resultStreamRef.current) return;
     setIsLipReadingLive(true);
     setTranscribedText('');
 
@@ -162,25 +173,19 @@ const AppContent = () => {
 
       // 2. Start Backend Process
       setLipReadingProcessing(true);
-      await fetch('http://127.0.0.1:5000/start_lip_reading');
+      const started = await fetch('http://127.0.0.1:5000/start_lip_reading');
+      if (!started.ok) throw new Error('Lip Reading worker failed to start');
 
       // 3. Switch to server video (backend pipe)
       setUseServerVideo(true);
 
-      // 4. Poll for results
-      processingIntervalRef.current = setInterval(async () => {
-        try {
-          const res = await fetch('http://127.0.0.1:5000/latest_result');
-          const data = await res.json();
-          if (data.type === 'lip-reading' && data.text) {
-            setTranscribedText(data.text);
-            addToHistory(data.text, 'lip-reading');
-          }
-        } catch (e) { console.error('Polling error', e); }
-      }, 1000);
-
-      // Keep loader visible for a moment while backend warms up
-      await new Promise(resolve => setTimeout(resolve, 3000));
+      // 4. Subscribe to pushed results
+      resultStreamRef.current = subscribeResults((data) => {
+        if (data.type === 'lip-reading' && data.text) {
+          setTranscribedText(data.text);
+          addToHistory(data.text, 'lip-reading');
+        }
+      });
 
     } catch (err) {
       console.error(err);
@@ -195,9 +200,9 @@ const AppContent = () => {
   const stopLipReading = async () => {
     setIsLipReadingLive(false);
     setLipReadingProcessing(false);
-    if (processingIntervalRef.current) {
-      clearInterval(processingIntervalRef.current);
-      processingIntervalRef.current = null;
+    if (resultStreamRef.current) {
+      resultStreamRef.current.close();
+      resultStreamRef.current = null;
     }
     try {
       await fetch('http://127.0.0.1:5000/stop_lip_reading');
@@ -207,7 +212,7 @@ const AppContent = () => {
 
   // --- Hand Gesture Logic ---
   const startGestures = async () => {
-    if (isGestureLive || processingIntervalRef.current) return;
+    if (isGestureLive || resultStreamRef.current) return;
     setIsGestureLive(true);
     setGestureText('');
     stopCamera(); // Release for backend
@@ -219,30 +224,19 @@ const AppContent = () => {
 
       // 2. Start Backend
       setGestureProcessing(true);
-      await fetch('http://127.0.0.1:5000/start_hand_gestures');
+      const started = await fetch('http://127.0.0.1:5000/start_hand_gestures');
+      if (!started.ok) throw new Error('Gesture worker failed to start');
 
       // 3. Switch video
       setUseServerVideo(true);
 
-      // 4. Poll
-      processingIntervalRef.current = setInterval(async () => {
-        try {
-          const res = await fetch('http://127.0.0.1:5000/latest_result');
-          const data = await res.json();
-          if (data.type === 'hand-gesture' && data.text) {
-            // Parse gesture text (backend should already parse, but handle both formats as safety)
-            let gestureText = data.text;
-            if (gestureText.startsWith('Recognized Gesture:')) {
-              gestureText = gestureText.replace('Recognized Gesture:', '').trim();
-            }
-            setGestureText(gestureText);
-            addToHistory(gestureText, 'gesture', false);
-          }
-        } catch (e) { console.error('Polling error', e); }
-      }, 1000);
-
-      // Keep loader visible for a moment while backend warms up
-      await new Promise(resolve => setTimeout(resolve, 3000));
+      // 4. Subscribe to pushed results
+      resultStreamRef.current = subscribeResults((data) => {
+        if (data.type === 'hand-gesture' && data.text) {
+          setGestureText(data.text);
+          addToHistory(data.text, 'gesture', false);
+        }
+      });
 
     } catch (err) {
       console.error(err);
@@ -257,9 +251,9 @@ const AppContent = () => {
   const stopGestures = async () => {
     setIsGestureLive(false);
     setGestureProcessing(false);
-    if (processingIntervalRef.current) {
-      clearInterval(processingIntervalRef.current);
-      processingIntervalRef.current = null;
+    if (resultStreamRef.current) {
+      resultStreamRef.current.close();
+      resultStreamRef.current = null;
     }
     try {
       await fetch('http://127.0.0.1:5000/stop_hand_gestures');